@@ -0,0 +1,114 @@
+"""
+Time-partitioned archival of attendance.
+
+Rows older than a cutoff are moved, one month (or year) at a time, into
+archive databases next to the main one, e.g. attendance_system.archive-2025-03.db.
+attendance_partitions in the main database records each archive and the ts
+range it covers; DatabaseManager attaches only the archives a query's date
+range touches. Daily rollups, faces and users stay in the main database, so
+summaries never open an archive. A term is simply the set of months it spans.
+
+    python -m attendance_archive                      # keep the last ARCHIVE_KEEP_MONTHS months
+    python -m attendance_archive --before 2026-02-01 --vacuum
+    python -m attendance_archive --list
+
+Moving a period inserts into the archive before deleting from the main
+database. Both sit in WAL mode, which does not make the two commits atomic
+together, so an interrupted run can leave a period in both; re-running the
+command finishes the move (rows already archived are skipped by id).
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+ARCHIVE_PERIODS = ("month", "year")
+ARCHIVE_KEEP_MONTHS = 6  # Default cutoff: the first day of the month this many months ago
+
+
+def create_partition_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_partitions (
+            name TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            rows INTEGER NOT NULL
+        )
+    """)
+
+
+def create_archive_schema(conn, schema):
+    """Create the attendance table of an attached archive; same layout as the main one."""
+    conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.attendance (
+            id INTEGER PRIMARY KEY,
+            person_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_attendance_person_ts ON attendance(person_id, ts)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_attendance_ts ON attendance(ts)")
+
+
+def period_bounds(ts, period="month"):
+    """
+    The local calendar month or year containing ts.
+
+    Returns:
+        tuple: (name such as '2025-03' or '2025', start ts, end ts).
+    """
+    day = datetime.fromtimestamp(ts)
+    if period == "year":
+        start, end = datetime(day.year, 1, 1), datetime(day.year + 1, 1, 1)
+        name = f"{day.year}"
+    else:
+        start = datetime(day.year, day.month, 1)
+        end = datetime(day.year + day.month // 12, day.month % 12 + 1, 1)
+        name = start.strftime("%Y-%m")
+    return name, int(start.timestamp()), int(end.timestamp())
+
+
+def archive_file_name(db_path, name):
+    """Archive file of partition name, relative to the main database's directory."""
+    return f"{os.path.splitext(os.path.basename(db_path))[0]}.archive-{name}.db"
+
+
+def default_cutoff(keep_months=ARCHIVE_KEEP_MONTHS):
+    today = datetime.now()
+    month = today.year * 12 + today.month - 1 - keep_months
+    return f"{month // 12:04d}-{month % 12 + 1:02d}-01"
+
+
+def main(argv=None):
+    from database import DATABASE_PATH, DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Move old attendance into per-period archive databases.")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--before", default=None,
+                        help=f"archive rows before this day, YYYY-MM-DD (default: {default_cutoff()})")
+    parser.add_argument("--period", choices=ARCHIVE_PERIODS, default="month")
+    parser.add_argument("--vacuum", action="store_true", help="compact the main database afterwards")
+    parser.add_argument("--list", action="store_true", help="only list the existing archives")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db)
+    try:
+        if not args.list:
+            start = time.perf_counter()
+            moved = db.archive_attendance(args.before or default_cutoff(), args.period)
+            for name, rows in moved:
+                print(f"  {name}: {rows} rows archived")
+            print(f"Archived {sum(rows for _, rows in moved)} rows into {len(moved)} partitions "
+                  f"in {time.perf_counter() - start:.1f}s")
+            if args.vacuum:
+                db.compact()
+        for partition in db.archive_partitions():
+            print(f"{partition.name}: {partition.rows} rows in {partition.path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
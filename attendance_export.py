@@ -0,0 +1,133 @@
+"""
+Streaming export of attendance records.
+
+    python -m attendance_export out.csv
+    python -m attendance_export out.parquet --name Alice --from 2026-01-01 --to 2026-03-31
+
+Rows go from one SQLite cursor to the file a chunk at a time, so memory use
+does not grow with the number of records. The file is written under a
+temporary name and renamed when complete; a cancelled or failed export leaves
+nothing behind. Parquet needs the optional 'pyarrow' package.
+"""
+import argparse
+import contextlib
+import csv
+import os
+
+from database import DATABASE_PATH, ATTENDANCE_EXPORT_CHUNK, AttendanceFilter, DatabaseManager
+
+EXPORT_COLUMNS = ["ID", "Name", "Timestamp"]
+EXPORT_FORMATS = {".csv": "csv", ".parquet": "parquet"}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_format(path):
+    """Format implied by the file extension; CSV when unknown."""
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetSink:
+    """One row group per chunk, so only a chunk is ever held in Arrow buffers."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet export needs the optional 'pyarrow' package") from e
+        self.pa = pa
+        self.schema = pa.schema([("id", pa.int64()), ("name", pa.string()), ("timestamp", pa.string())])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        ids, names, timestamps = zip(*rows)
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(ids, self.pa.int64()), self.pa.array(names), self.pa.array(timestamps)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_attendance(db: DatabaseManager, path, filters=None, fmt=None, sort="timestamp", descending=True,
+                      chunk_size=ATTENDANCE_EXPORT_CHUNK, progress=None, is_cancelled=None):
+    """
+    Write the records matching filters to path.
+
+    Args:
+        fmt (str): 'csv' or 'parquet'; taken from the extension when None.
+        progress (callable): Called as progress(rows_written, total) after every chunk.
+        is_cancelled (callable): Polled between chunks; returning True aborts
+            the export with ExportCancelled.
+
+    Returns:
+        int: Rows written.
+    """
+    fmt = fmt or export_format(path)
+    total = db.count_attendance(filters)
+    tmp_path = path + ".part"
+    sink = None
+    written = 0
+    try:
+        sink = _ParquetSink(tmp_path) if fmt == "parquet" else _CsvSink(tmp_path)
+        if progress:
+            progress(0, total)
+        for rows in db.iter_attendance(filters, sort, descending, chunk_size):
+            if is_cancelled and is_cancelled():
+                raise ExportCancelled(f"Export cancelled after {written} rows")
+            sink.write(rows)
+            written += len(rows)
+            if progress:
+                progress(written, max(total, written))  # Rows may arrive after the count
+        sink, closing = None, sink  # A failed close must not be retried below
+        closing.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Clean up without masking the original error
+        if sink is not None:
+            with contextlib.suppress(OSError):
+                sink.close()
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export attendance records to CSV or Parquet.")
+    parser.add_argument("path", help="output file (.csv or .parquet)")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--name")
+    parser.add_argument("--from", dest="date_from", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="last day, YYYY-MM-DD")
+    parser.add_argument("--keyword")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db)
+    try:
+        filters = AttendanceFilter(args.name, args.date_from, args.date_to, args.keyword)
+        count = export_attendance(db, args.path, filters,
+                                  progress=lambda done, total: print(f"\r{done}/{total} rows", end=""))
+        print(f"\nExported {count} records to {args.path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
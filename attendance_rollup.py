@@ -0,0 +1,138 @@
+"""
+Daily attendance rollups: one attendance_daily row per (person_id, date) with
+the first and last sign-in of that local day and the number of sign-ins.
+
+DatabaseManager keeps the rollups current in the same transaction as every
+insert into or delete from attendance, so reports can read attendance_daily
+instead of scanning raw sign-ins. The rollups always stay in the main database,
+also for days whose raw rows were moved to an archive. Rebuild them after
+editing attendance by other means:
+
+    python -m attendance_rollup                       # everything
+    python -m attendance_rollup --from 2026-09-01     # only from that day on
+"""
+import argparse
+import time
+
+from timestamps import day_range
+
+_UPSERT = """
+    INSERT INTO attendance_daily (person_id, date, first_seen, last_seen, count)
+    VALUES (?1, date(?2, 'unixepoch', 'localtime'), ?2, ?2, 1)
+    ON CONFLICT(person_id, date) DO UPDATE SET
+        first_seen = min(first_seen, excluded.first_seen),
+        last_seen = max(last_seen, excluded.last_seen),
+        count = count + 1
+"""
+
+_MERGE = """
+    INSERT INTO attendance_daily (person_id, date, first_seen, last_seen, count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(person_id, date) DO UPDATE SET
+        first_seen = min(first_seen, excluded.first_seen),
+        last_seen = max(last_seen, excluded.last_seen),
+        count = count + excluded.count
+"""
+
+
+def create_rollup_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            person_id INTEGER NOT NULL REFERENCES faces(id),
+            date TEXT NOT NULL,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (person_id, date)
+        ) WITHOUT ROWID
+    """)
+    # Per-day and date-range reports; per-person reports use the primary key
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_daily_date ON attendance_daily(date)")
+
+
+def record_daily(conn, records):
+    """Fold newly inserted (person_id, ts) records into the rollups."""
+    conn.executemany(_UPSERT, records)
+
+
+def _where(column, date_from, date_to, person_id, as_ts):
+    conditions, values = [], []
+    if person_id is not None:
+        conditions.append("person_id = ?")
+        values.append(person_id)
+    if date_from:
+        conditions.append(f"{column} >= ?")
+        values.append(day_range(date_from)[0] if as_ts else date_from)
+    if date_to:
+        conditions.append(f"{column} {'<' if as_ts else '<='} ?")
+        values.append(day_range(date_to)[1] if as_ts else date_to)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", values
+
+
+def daily_aggregates(conn, schema="main", date_from=None, date_to=None, person_id=None):
+    """
+    (person_id, date, first_seen, last_seen, count) rows of schema.attendance
+    between two days (inclusive, open-ended when None).
+    """
+    # Day bounds as ts ranges, so idx_attendance_ts / idx_attendance_person_ts are used
+    where, values = _where("ts", date_from, date_to, person_id, as_ts=True)
+    return conn.execute(f"""
+        SELECT person_id, date(ts, 'unixepoch', 'localtime'), min(ts), max(ts), count(*)
+        FROM {schema}.attendance{where} GROUP BY 1, 2
+    """, values).fetchall()
+
+
+def clear_daily(conn, date_from=None, date_to=None, person_id=None):
+    where, values = _where("date", date_from, date_to, person_id, as_ts=False)
+    conn.execute("DELETE FROM attendance_daily" + where, values)
+
+
+def merge_daily(conn, aggregates):
+    """Add daily_aggregates() rows, combining days whose raw rows are split across databases."""
+    conn.executemany(_MERGE, aggregates)
+
+
+def refresh_daily(conn, person_id, day, schemas=("main",)):
+    """Recompute one (person_id, day) rollup from the raw rows, e.g. after a delete."""
+    clear_daily(conn, day, day, person_id)
+    for schema in schemas:
+        merge_daily(conn, daily_aggregates(conn, schema, day, day, person_id))
+
+
+def rebuild_daily(conn, date_from=None, date_to=None, schemas=("main",)):
+    """
+    Recompute the rollups of every day in [date_from, date_to] (open-ended when
+    None) from the attendance tables of schemas.
+
+    Returns:
+        int: Aggregated rows merged into the rollups.
+    """
+    clear_daily(conn, date_from, date_to)
+    merged = 0
+    for schema in schemas:
+        aggregates = daily_aggregates(conn, schema, date_from, date_to)
+        merge_daily(conn, aggregates)
+        merged += len(aggregates)
+    return merged
+
+
+def main(argv=None):
+    from database import DATABASE_PATH, DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily attendance rollups from the raw records.")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--from", dest="date_from", help="first day to rebuild, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="last day to rebuild, YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db)
+    try:
+        start = time.perf_counter()
+        rows = db.rebuild_attendance_rollups(args.date_from, args.date_to)
+        print(f"Rebuilt {rows} daily rollups in {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
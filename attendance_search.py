@@ -0,0 +1,129 @@
+"""
+Keyword search over attendance.
+
+A query such as "ali 2026-03" is split into tokens. Date tokens (2026,
+2026-03, 2026-03-05) become ts ranges on idx_attendance_ts and time tokens
+(08:, 08:30) match the local time of day. Every other token must occur in the
+name. Names are looked up in faces_fts, an FTS5 trigram index over faces.name,
+and the matches are turned into person_id IN (...) so idx_attendance_person_ts
+is used. The raw table is never scanned with LIKE.
+"""
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+from timestamps import to_epoch
+
+_DATE_TOKEN = re.compile(r"^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$")
+_TIME_TOKEN = re.compile(r"^\d{1,2}:(\d{1,2}(:\d{0,2})?)?$")
+
+
+def create_search_index(conn):
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS faces_fts
+        USING fts5(name, content='faces', content_rowid='id', tokenize='trigram')
+    """)
+    # External content: the index follows faces through these triggers
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS faces_fts_ai AFTER INSERT ON faces BEGIN
+            INSERT INTO faces_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS faces_fts_ad AFTER DELETE ON faces BEGIN
+            INSERT INTO faces_fts (faces_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS faces_fts_au AFTER UPDATE OF name ON faces BEGIN
+            INSERT INTO faces_fts (faces_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO faces_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    conn.execute("INSERT INTO faces_fts (faces_fts) VALUES ('rebuild')")
+
+
+def date_token_range(token):
+    """
+    Timestamp range [start, end) covered by a year, month or day token, or None.
+
+    >>> date_token_range("2026-3")
+    ('2026-03-01', '2026-04-01')
+    """
+    match = _DATE_TOKEN.match(token)
+    if not match:
+        return None
+    year, month, day = (int(part) if part else None for part in match.groups())
+    try:
+        if day is not None:
+            start = date(year, month, day)
+            end = date.fromordinal(start.toordinal() + 1)
+        elif month is not None:
+            start = date(year, month, 1)
+            end = date(year + month // 12, month % 12 + 1, 1)
+        else:
+            start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    except ValueError:
+        return None  # Not a real date; searched as part of a name instead
+    return start.isoformat(), end.isoformat()
+
+
+def parse_query(text):
+    """
+    Split a search string into indexed predicates.
+
+    Returns:
+        tuple: (date ranges, time-of-day prefixes, name fragments).
+    """
+    ranges, times, names = [], [], []
+    for token in text.split():
+        token_range = date_token_range(token)
+        if token_range:
+            ranges.append(token_range)
+        elif _TIME_TOKEN.match(token):
+            times.append(token if token.index(":") == 2 else "0" + token)  # 8:30 -> 08:30
+        else:
+            names.append(token)
+    return ranges, times, names
+
+
+def keyword_where(text):
+    """
+    SQL conditions (joined with AND) and parameters for a search string over attendance.
+    """
+    ranges, times, names = parse_query(text)
+    conditions, values = [], []
+    for start, end in ranges:
+        conditions.append("ts >= ? AND ts < ?")
+        values.extend([to_epoch(start), to_epoch(end)])
+    for prefix in times:
+        # The time of day is not indexed, and converting every ts to local time is slow.
+        # A seconds-of-day window for each UTC offset the zone uses rejects most rows
+        # cheaply; only those inside it get the exact comparison.
+        low = _seconds_of_day(prefix + "00:00:00"[len(prefix):])
+        high = _seconds_of_day(prefix + "99:99:99"[len(prefix):])
+        offsets = _utc_offsets()
+        conditions.append("(" + " OR ".join("(ts + ?) % 86400 BETWEEN ? AND ?" for _ in offsets) + ")"
+                          " AND substr(time(ts, 'unixepoch', 'localtime'), 1, ?) = ?")
+        for offset in offsets:
+            values.extend([offset, low, high])
+        values.extend([len(prefix), prefix])
+    if names:
+        # Trigram LIKE is answered from the FTS index for fragments of three or more
+        # characters; shorter ones scan faces_fts, which has one row per person
+        conditions.append("person_id IN (SELECT rowid FROM faces_fts WHERE "
+                          + " AND ".join("name LIKE ?" for _ in names) + ")")
+        values.extend(f"%{name}%" for name in names)
+    return conditions, values
+
+
+def _seconds_of_day(text):
+    hours, minutes, seconds = (int(part) for part in text.split(":"))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+@lru_cache(maxsize=1)
+def _utc_offsets():
+    """Every UTC offset (seconds) of the local zone, sampled in winter and summer since 1970."""
+    return sorted({int(datetime(year, month, 1).astimezone().utcoffset().total_seconds())
+                   for year in range(1970, datetime.now().year + 2) for month in (1, 7)})
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+
+from database import DatabaseManager, DATABASE_PATH
+
+WRITE_BATCH_SIZE = 50  # Records that trigger an immediate flush
+WRITE_FLUSH_INTERVAL = 1.0  # Seconds a record may wait in memory before it is written
+EMA_ALPHA = 0.2  # Smoothing of the flush latency
+
+
+class AttendanceWriter:
+    """
+    Write-behind queue for attendance records.
+
+    add() only timestamps the record and appends it to an in-memory queue, so
+    the caller (GUI or pipeline thread) never waits on SQLite. A background
+    thread writes the queue through the shared pool's writer in one executemany
+    transaction once batch_size records are waiting or the oldest one is
+    flush_interval seconds old. close() flushes everything before returning.
+    """
+
+    def __init__(self, db_path=DATABASE_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending = deque()  # (name, epoch seconds, enqueued_at)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._flush_requested = False
+        self._queued = 0  # Records ever added
+        self._written = 0  # Records committed to the database
+
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+        self.avg_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.max_queue_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, name, timestamp=None):
+        """Queue a sign-in; the timestamp is taken now, not when the record is written."""
+        timestamp = timestamp if timestamp is not None else int(time.time())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("AttendanceWriter has been closed")
+            self._pending.append((name, timestamp, time.monotonic()))
+            self._queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+            # Wake the writer to start the flush_interval timer, or to flush a full batch
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout=5):
+        """
+        Write everything queued so far and wait for it.
+
+        Returns:
+            bool: True if the records were committed within timeout.
+        """
+        with self._cond:
+            target = self._queued
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._written >= target or not self._thread.is_alive(), timeout) \
+                and self._written >= target
+
+    def close(self, timeout=5):
+        """Flush the queue and stop the writer thread. Returns True if nothing was lost."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            lost = len(self._pending)
+        if lost:
+            print(f"[DEBUG] Attendance writer stopped with {lost} unwritten records.")
+        return lost == 0
+
+    def stats(self):
+        """Queue depth, throughput and flush latency."""
+        # One consistent snapshot: the writer thread updates these under the same lock
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self.max_queue_depth,
+                "oldest_pending_s": time.monotonic() - self._pending[0][2] if self._pending else 0.0,
+                "written": self._written,
+                "batches": self.batches,
+                "failures": self.failures,
+                "last_flush_ms": self.last_flush_ms,
+                "avg_flush_ms": self.avg_flush_ms,
+                "max_flush_ms": self.max_flush_ms,
+            }
+
+    def _due(self):
+        if not self._pending:
+            self._flush_requested = False
+            return self._closed
+        return (self._closed or self._flush_requested or len(self._pending) >= self.batch_size
+                or time.monotonic() - self._pending[0][2] >= self.flush_interval)
+
+    def _run(self):
+        db = DatabaseManager(self.db_path)
+        try:
+            while True:
+                with self._cond:
+                    while not self._due():
+                        age = time.monotonic() - self._pending[0][2] if self._pending else None
+                        self._cond.wait(None if age is None else self.flush_interval - age)
+                    if not self._pending:  # Closed and drained
+                        return
+                    batch = list(self._pending)
+
+                start = time.perf_counter()
+                try:
+                    db.add_attendance_records([(name, timestamp) for name, timestamp, _ in batch])
+                except Exception as e:
+                    with self._cond:
+                        self.failures += 1
+                    print(f"[DEBUG] Attendance flush of {len(batch)} records failed: {e}")
+                    if self._closed:
+                        return
+                    time.sleep(self.flush_interval)  # Keep the records and retry
+                    continue
+                elapsed = 1000 * (time.perf_counter() - start)
+
+                with self._cond:
+                    for _ in batch:
+                        self._pending.popleft()
+                    self._written += len(batch)
+                    self.batches += 1
+                    self.last_flush_ms = elapsed
+                    self.max_flush_ms = max(self.max_flush_ms, elapsed)
+                    self.avg_flush_ms = elapsed if self.batches == 1 else \
+                        (1 - EMA_ALPHA) * self.avg_flush_ms + EMA_ALPHA * elapsed
+                    self._cond.notify_all()
+        finally:
+            db.close()
@@ -1,40 +1,245 @@
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
+
+from attendance_archive import archive_file_name, create_archive_schema, period_bounds
+from attendance_rollup import clear_daily, daily_aggregates, merge_daily, record_daily, refresh_daily
+from attendance_search import keyword_where, parse_query
+from embedding_codec import encode_embedding, split_embeddings
+from migrations import apply_migrations
+from timestamps import DATE_FORMAT, day_range, to_epoch
+
 DATABASE_PATH = "attendance_system.db"
+MAX_SAMPLES_PER_FACE = 20  # Oldest samples are dropped beyond this
+ATTENDANCE_PAGE_SIZE = 200  # Rows per keyset page in the admin table
+ATTENDANCE_EXPORT_CHUNK = 5000  # Rows fetched per round trip when streaming an export
+# Sort orders for attendance pages; each ends in id so the key is unique, and each
+# is the column order of an index (the rowid is implicitly part of every index)
+ATTENDANCE_SORT_KEYS = {
+    "timestamp": ("a.ts", "a.id"),
+    "name": ("f.name", "a.ts", "a.id"),
+}
+MAX_ATTACHED_ARCHIVES = 8  # SQLite attaches at most 10 databases per connection by default
+
+# Connection tuning. WAL lets readers run while the attendance writer commits, and with
+# WAL synchronous=NORMAL only syncs at checkpoints (a crash can lose the last commits,
+# never corrupt the file). Negative cache_size is in KiB.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32000,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# Callbacks notified after the faces table changes: callback(db_path, event, name, value).
+# event is "add", "delete", "update" or "rename"; value is the encoded centroid blob for
+# add/update (also sent when samples are added), the new name for rename and None for delete.
+_face_listeners = []
+
+
+def register_face_listener(callback):
+    """
+    Subscribe to changes of the faces table made through any DatabaseManager.
+    """
+    if callback not in _face_listeners:
+        _face_listeners.append(callback)
+
+
+def unregister_face_listener(callback):
+    if callback in _face_listeners:
+        _face_listeners.remove(callback)
+
+
+def connect(db_path=DATABASE_PATH, **kwargs):
+    """Open a SQLite connection with SQLITE_PRAGMAS applied."""
+    conn = sqlite3.connect(db_path, **kwargs)
+    for pragma, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+@dataclass
+class AttendanceFilter:
+    """Attendance filters shared by the admin table, its row count and exports."""
+    name: Optional[str] = None
+    date_from: Optional[str] = None  # 'YYYY-MM-DD', inclusive
+    date_to: Optional[str] = None  # 'YYYY-MM-DD', inclusive
+    keyword: Optional[str] = None  # Search string, see attendance_search
+
+    def where(self) -> tuple[str, list]:
+        """SQL WHERE clause (empty if unfiltered) and its parameters."""
+        conditions, values = [], []
+        if self.name:
+            conditions.append("person_id = (SELECT id FROM faces WHERE name = ?)")
+            values.append(self.name)
+        if self.date_from:
+            conditions.append("ts >= ?")
+            values.append(day_range(self.date_from)[0])
+        if self.date_to:
+            conditions.append("ts < ?")
+            values.append(day_range(self.date_to)[1])
+        if self.keyword:
+            keyword_conditions, keyword_values = keyword_where(self.keyword)
+            conditions.extend(keyword_conditions)
+            values.extend(keyword_values)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", values
+
+    def ts_bounds(self) -> tuple[Optional[int], Optional[int]]:
+        """[low, high) ts range every matching row lies in (None if open), used to skip archives."""
+        lows, highs = [], []
+        if self.date_from:
+            lows.append(day_range(self.date_from)[0])
+        if self.date_to:
+            highs.append(day_range(self.date_to)[1])
+        if self.keyword:
+            for start, end in parse_query(self.keyword)[0]:
+                lows.append(to_epoch(start))
+                highs.append(to_epoch(end))
+        return max(lows, default=None), min(highs, default=None)
+
+
+@dataclass
+class Partition:
+    """Archived attendance with start_ts <= ts < end_ts, kept in its own database file."""
+    name: str  # Period, e.g. '2025-03' or '2025'
+    path: str
+    start_ts: int
+    end_ts: int
+    rows: int
+
+    @property
+    def schema(self) -> str:
+        """Name the archive is attached under."""
+        return "archive_" + self.name.replace("-", "_")
+
+
+class ConnectionPool:
+    """
+    SQLite connections for one database file, safe to use from any thread.
+
+    Writes are serialized through a single writer connection: SQLite admits one
+    writer at a time anyway, and queueing on a lock here avoids busy retries.
+    Every thread reads through its own read-only connection, which in WAL mode
+    runs concurrently with the writer and with the other readers.
+    """
+
+    def __init__(self, db_path=DATABASE_PATH):
+        self.db_path = db_path
+        self._writer = connect(db_path, check_same_thread=False)
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._refs = 0
+
+    @contextmanager
+    def write(self):
+        """Exclusive use of the writer connection; commits on success, rolls back on error."""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def read(self):
+        """This thread's read-only connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA query_only = 1")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._write_lock:
+            # Let SQLite refresh planner statistics for the indexes it used
+            self._writer.execute("PRAGMA optimize")
+            self._writer.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def acquire_pool(db_path=DATABASE_PATH) -> ConnectionPool:
+    """Shared pool for db_path; balance every call with release_pool."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path)
+        pool._refs += 1
+        return pool
+
+
+def release_pool(pool: ConnectionPool):
+    """Drop a reference from acquire_pool; the last one closes the connections."""
+    with _pools_lock:
+        pool._refs -= 1
+        if pool._refs > 0:
+            return
+        _pools.pop(os.path.abspath(pool.db_path), None)
+    pool.close()
+
 
 class DatabaseManager:
+    """
+    Data access for the attendance database.
+
+    All instances for the same file share one ConnectionPool, so a manager may
+    be used from any thread: reads run on per-thread connections, writes are
+    serialized on the pool's writer.
+    """
+
     def __init__(self, db_path=DATABASE_PATH):
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+        self.pool = acquire_pool(db_path)
         self._initialize_database()
 
     def _initialize_database(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS faces (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                embedding BLOB NOT NULL
-            )
-        """)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                timestamp TEXT NOT NULL
-            )
-        """)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL
-            )
-        """)
-        self.conn.commit()
+        with self.pool.write() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS faces (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    embedding BLOB NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS attendance (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL UNIQUE,
+                    password TEXT NOT NULL,
+                    role TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+
+            # Everything added to the schema since the tables above lives in migrations.py
+            apply_migrations(conn)
 
         # Create default users if not present
         # if not self.get_all_users():
@@ -44,51 +249,207 @@ class DatabaseManager:
         #     self.add_user("admin", "admin", "Admin")
         #     self.add_user("dev", "devmode", "Developer")
 
-    def add_new_face(self, name: str, embedding: bytes) -> bool:
-        if self.face_exists(name):
-            return False
-        self.cursor.execute("INSERT INTO faces (name, embedding) VALUES (?, ?)", (name, embedding))
-        self.conn.commit()
+    def _fetchall(self, query: str, params=()) -> list:
+        with self.pool.read() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _fetchone(self, query: str, params=()):
+        with self.pool.read() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def _execute(self, query: str, params=()) -> int:
+        """Run one write statement in its own transaction and return the affected row count."""
+        with self.pool.write() as conn:
+            return conn.execute(query, params).rowcount
+
+    def add_new_face(self, name: str, embedding) -> bool:
+        """
+        Enroll a new person.
+
+        Args:
+            embedding: One embedding or several samples (NxD tensor/array, or a
+                list of tensors, arrays or encoded blobs).
+        """
+        samples = split_embeddings(embedding)
+        centroid = self._centroid(samples)
+        with self.pool.write() as conn:
+            if self._face_id(conn, name) is not None:
+                return False
+            self._insert_samples(conn, self._add_face(conn, name, centroid), samples)
+        self._notify_face_change("add", name, centroid)
         return True
 
+    def add_face_samples(self, name: str, embeddings) -> bool:
+        """Add samples to an enrolled person and refresh their centroid."""
+        samples = split_embeddings(embeddings)
+        with self.pool.write() as conn:
+            face_id = self._face_id(conn, name)
+            if face_id is None:
+                return False
+            self._insert_samples(conn, face_id, samples)
+            centroid = self._store_centroid(conn, face_id)
+        self._notify_face_change("update", name, centroid)
+        return True
+
+    def enroll_faces(self, faces: dict) -> tuple[int, int]:
+        """
+        Enroll many people in a single transaction (used by the enroll command).
+
+        Args:
+            faces (dict): name -> embeddings (anything add_new_face accepts).
+                Unknown names are added; known names get the samples appended.
+
+        Returns:
+            tuple: (added, extended) number of people.
+        """
+        changes = []
+        with self.pool.write() as conn:
+            for name, embeddings in faces.items():
+                samples = split_embeddings(embeddings)
+                face_id = self._face_id(conn, name)
+                if face_id is None:
+                    face_id, event = self._add_face(conn, name, self._centroid(samples)), "add"
+                else:
+                    event = "update"
+                self._insert_samples(conn, face_id, samples)
+                changes.append((event, name, self._store_centroid(conn, face_id)))
+
+        for event, name, centroid in changes:
+            self._notify_face_change(event, name, centroid)
+        added = sum(event == "add" for event, _, _ in changes)
+        return added, len(changes) - added
+
     def delete_face(self, name: str) -> bool:
-        self.cursor.execute("DELETE FROM faces WHERE name = ?", (name,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        """Stop recognizing a person; someone with attendance history keeps their faces row for it."""
+        with self.pool.write() as conn:
+            face_id = self._face_id(conn, name)
+            if face_id is None:
+                return False
+            conn.execute("DELETE FROM face_embeddings WHERE face_id = ?", (face_id,))
+            # The rollups cover archived attendance too
+            if conn.execute("SELECT 1 FROM attendance_daily WHERE person_id = ? LIMIT 1", (face_id,)).fetchone():
+                conn.execute("UPDATE faces SET enrolled = 0 WHERE id = ?", (face_id,))
+            else:
+                conn.execute("DELETE FROM faces WHERE id = ?", (face_id,))
+        self._notify_face_change("delete", name)
+        return True
 
-    def update_face(self, name: str, new_embedding: bytes) -> bool:
-        self.cursor.execute("UPDATE faces SET embedding = ? WHERE name = ?", (new_embedding, name))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+    def update_face(self, name: str, new_embedding) -> bool:
+        """Replace every sample of a person with new_embedding (one or several samples)."""
+        samples = split_embeddings(new_embedding)
+        with self.pool.write() as conn:
+            face_id = self._face_id(conn, name)
+            if face_id is None:
+                return False
+            conn.execute("DELETE FROM face_embeddings WHERE face_id = ?", (face_id,))
+            self._insert_samples(conn, face_id, samples)
+            centroid = self._store_centroid(conn, face_id)
+        self._notify_face_change("update", name, centroid)
+        return True
+
+    def get_face_samples(self, name: str) -> list[bytes]:
+        rows = self._fetchall("""
+            SELECT e.embedding FROM face_embeddings e JOIN faces f ON f.id = e.face_id
+            WHERE f.name = ? ORDER BY e.id
+        """, (name,))
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _face_id(conn, name: str) -> Optional[int]:
+        """Id of an enrolled person."""
+        row = conn.execute("SELECT id FROM faces WHERE name = ? AND enrolled = 1", (name,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _add_face(conn, name: str, centroid: bytes) -> int:
+        """Insert a person, or re-enroll one kept only for their attendance history."""
+        row = conn.execute("SELECT id FROM faces WHERE name = ?", (name,)).fetchone()
+        if row:
+            conn.execute("UPDATE faces SET embedding = ?, enrolled = 1 WHERE id = ?", (centroid, row[0]))
+            return row[0]
+        return conn.execute("INSERT INTO faces (name, embedding) VALUES (?, ?)", (name, centroid)).lastrowid
+
+    @staticmethod
+    def _person_id(conn, name: str) -> int:
+        """faces.id for attendance of name, enrolled or not; unknown names get an unenrolled row."""
+        row = conn.execute("SELECT id FROM faces WHERE name = ?", (name,)).fetchone()
+        if row:
+            return row[0]
+        return conn.execute("INSERT INTO faces (name, embedding, enrolled) VALUES (?, x'', 0)", (name,)).lastrowid
+
+    @staticmethod
+    def _insert_samples(conn, face_id: int, samples: list):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.executemany(
+            "INSERT INTO face_embeddings (face_id, embedding, created_at) VALUES (?, ?, ?)",
+            [(face_id, encode_embedding(sample), timestamp) for sample in samples]
+        )
+        conn.execute("""
+            DELETE FROM face_embeddings WHERE face_id = ? AND id NOT IN (
+                SELECT id FROM face_embeddings WHERE face_id = ? ORDER BY id DESC LIMIT ?
+            )
+        """, (face_id, face_id, MAX_SAMPLES_PER_FACE))
+
+    def _store_centroid(self, conn, face_id: int) -> bytes:
+        rows = conn.execute("SELECT embedding FROM face_embeddings WHERE face_id = ?", (face_id,)).fetchall()
+        centroid = self._centroid(split_embeddings([row[0] for row in rows]))
+        conn.execute("UPDATE faces SET embedding = ? WHERE id = ?", (centroid, face_id))
+        return centroid
+
+    @staticmethod
+    def _centroid(samples: list) -> bytes:
+        """Encoded mean of the L2-normalized samples."""
+        if not samples:
+            raise ValueError("A face needs at least one embedding")
+        matrix = np.vstack(samples)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return encode_embedding(matrix.mean(axis=0))
 
     def rename_face(self, old_name: str, new_name: str) -> bool:
-        if self.face_exists(new_name):
-            return False
-        self.cursor.execute("UPDATE faces SET name = ? WHERE name = ?", (new_name, old_name))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        with self.pool.write() as conn:
+            # Names stay unique across unenrolled people too; their history is still shown by name
+            if conn.execute("SELECT 1 FROM faces WHERE name = ?", (new_name,)).fetchone():
+                return False
+            # Attendance refers to faces.id, so the history follows the new name
+            changed = conn.execute("UPDATE faces SET name = ? WHERE name = ? AND enrolled = 1",
+                                   (new_name, old_name)).rowcount > 0
+        if changed:
+            self._notify_face_change("rename", old_name, new_name)
+        return changed
+
+    def _notify_face_change(self, event: str, name: str, value=None):
+        for callback in list(_face_listeners):
+            try:
+                callback(self.db_path, event, name, value)
+            except Exception as e:
+                print(f"[DEBUG] Face listener failed on {event} {name}: {e}")
 
     def view_faces(self) -> list[str]:
-        self.cursor.execute("SELECT name FROM faces")
-        return [row[0] for row in self.cursor.fetchall()]
+        return [row[0] for row in self._fetchall("SELECT name FROM faces WHERE enrolled = 1")]
 
     def get_embedding_by_name(self, name: str):
-        self.cursor.execute("SELECT embedding FROM faces WHERE name = ?", (name,))
-        row = self.cursor.fetchone()
+        row = self._fetchone("SELECT embedding FROM faces WHERE name = ? AND enrolled = 1", (name,))
         return row[0] if row else None
 
     def face_exists(self, name: str) -> bool:
-        self.cursor.execute("SELECT 1 FROM faces WHERE name = ? LIMIT 1", (name,))
-        return self.cursor.fetchone() is not None
+        return self._fetchone("SELECT 1 FROM faces WHERE name = ? AND enrolled = 1", (name,)) is not None
 
     def get_all_embeddings(self) -> list[tuple[str, bytes]]:
-        self.cursor.execute("SELECT name, embedding FROM faces")
-        return self.cursor.fetchall()
+        return self._fetchall("SELECT name, embedding FROM faces WHERE enrolled = 1")
 
     def add_attendance_record(self, name: str):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.cursor.execute("INSERT INTO attendance (name, timestamp) VALUES (?, ?)", (name, timestamp))
-        self.conn.commit()
+        self.add_attendance_records([(name, datetime.now())])
+
+    def add_attendance_records(self, records: list[tuple]):
+        """
+        Insert (name, timestamp) records and update their daily rollups in one transaction.
+        timestamp may be epoch seconds, a datetime or a 'YYYY-MM-DD HH:MM:SS' string.
+        """
+        with self.pool.write() as conn:
+            person_ids = {name: self._person_id(conn, name) for name in {name for name, _ in records}}
+            rows = [(person_ids[name], to_epoch(timestamp)) for name, timestamp in records]
+            conn.executemany("INSERT INTO attendance (person_id, ts) VALUES (?, ?)", rows)
+            record_daily(conn, rows)
 
     def get_attendance_records(self, name: Optional[str] = None, date: Optional[str] = None) -> list[
         tuple[int, str, str]]:
@@ -96,70 +457,337 @@ class DatabaseManager:
         Retrieve attendance records, optionally filtered by name and date.
         Date format should be 'YYYY-MM-DD'.
         """
-        query = "SELECT id, name, timestamp FROM attendance"
-        conditions = []
-        values = []
+        return self.get_attendance_page(AttendanceFilter(name=name, date_from=date, date_to=date), limit=None)
+
+    def count_attendance(self, filters: Optional[AttendanceFilter] = None, cap: Optional[int] = None) -> int:
+        """
+        Number of rows matching filters; name and date predicates are answered from the indexes.
+        With cap, counting stops there, so broad searches cost at most cap index entries.
+        """
+        filters = filters or AttendanceFilter()
+        where, values = filters.where()
+        total = 0
+        for _, _, partition in self._attendance_sources(*filters.ts_bounds()):
+            with self.pool.read() as conn:
+                table = f"{self._attach(conn, partition)}.attendance"
+                if cap is None:
+                    total += conn.execute(f"SELECT COUNT(*) FROM {table}{where}", values).fetchone()[0]
+                    continue
+                total += conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM {table}{where} LIMIT ?)",
+                                      values + [cap - total]).fetchone()[0]
+            if total >= cap:
+                break
+        return total
+
+    def get_attendance_page(self, filters: Optional[AttendanceFilter] = None, after: Optional[tuple] = None,
+                            limit: Optional[int] = ATTENDANCE_PAGE_SIZE, sort: str = "timestamp",
+                            descending: bool = True) -> list[tuple[int, str, str]]:
+        """
+        One page of (id, name, timestamp) rows, using keyset pagination.
+
+        The main database and every archive whose time range the filters (and,
+        sorted by time, the keyset) overlap are queried; their rows are merged
+        in sort order.
+
+        Args:
+            filters (AttendanceFilter): Predicates pushed into the query.
+            after (tuple): attendance_sort_key() of the last row of the previous
+                page; the page starts right after it. None for the first page.
+            limit (int): Page size, or None for every remaining row.
+            sort (str): A key of ATTENDANCE_SORT_KEYS.
+        """
+        filters = filters or AttendanceFilter()
+        low, high = filters.ts_bounds()
+        if after is not None:
+            after = self._resolve_sort_key(after, sort)
+            if after is None:
+                return []  # The previous page's last row has been deleted since
+            if sort == "timestamp" and descending:
+                high = after[0] + 1 if high is None else min(high, after[0] + 1)
+            elif sort == "timestamp":
+                low = after[0] if low is None else max(low, after[0])
+        sources = self._attendance_sources(low, high)
+        if sort == "timestamp":
+            # Nearest first, so the page is usually complete after one or two databases
+            sources.sort(key=lambda source: source[1] if descending else source[0], reverse=descending)
+        positions = [{"a.id": 0, "f.name": 1, "a.ts": 3}[key] for key in ATTENDANCE_SORT_KEYS[sort]]
+
+        rows = []
+        for start, end, partition in sources:
+            if sort == "timestamp" and limit is not None and len(rows) >= limit:
+                last = rows[-1][3]
+                if (end <= last) if descending else (start > last):
+                    break  # Nothing in this or any later database sorts before the rows collected
+            with self.pool.read() as conn:
+                query, values = self._attendance_query(filters, after, sort, descending,
+                                                       self._attach(conn, partition))
+                if limit is not None:
+                    query += " LIMIT ?"
+                    values.append(limit)
+                rows.extend(conn.execute(query, values).fetchall())
+            if len(sources) > 1:
+                rows.sort(key=lambda row: tuple(row[i] for i in positions), reverse=descending)
+                if limit is not None:
+                    del rows[limit:]
+        return [row[:3] for row in rows]
+
+    def _attendance_sources(self, low: Optional[int] = None, high: Optional[int] = None) -> list[
+            tuple[int, int, Optional[Partition]]]:
+        """
+        (start ts, end ts, archive or None for the main database) of every database
+        holding attendance with low <= ts < high (either may be None).
+        """
+        sources = [(partition.start_ts, partition.end_ts, partition)
+                   for partition in self.archive_partitions(low, high)]
+        # Separate subqueries, so each is one seek in idx_attendance_ts
+        first, last = self._fetchone("SELECT (SELECT MIN(ts) FROM attendance), (SELECT MAX(ts) FROM attendance)")
+        if first is not None and (high is None or first < high) and (low is None or last >= low):
+            sources.insert(0, (first, last + 1, None))
+        return sources
+
+    def iter_attendance(self, filters: Optional[AttendanceFilter] = None, sort: str = "timestamp",
+                        descending: bool = True, chunk_size: int = ATTENDANCE_EXPORT_CHUNK):
+        """
+        Stream every matching (id, name, timestamp) row in lists of at most chunk_size.
 
-        if name:
-            conditions.append("name = ?")
-            values.append(name)
-        if date:
-            conditions.append("DATE(timestamp) = ?")
-            values.append(date)
+        Memory stays at one chunk however large the result. When the databases
+        involved do not overlap in time (archives never do; the main database
+        only does after backdated inserts) and the rows are sorted by time, each
+        database is read in turn with one cursor and fetchmany, which WAL gives a
+        consistent snapshot while the attendance writer keeps inserting.
+        Otherwise the rows are merged one keyset page at a time.
+        """
+        filters = filters or AttendanceFilter()
+        sources = sorted(self._attendance_sources(*filters.ts_bounds()), key=lambda source: source[0])
+        if len(sources) > 1 and (sort != "timestamp" or any(
+                earlier[1] > later[0] for earlier, later in zip(sources, sources[1:]))):
+            after = None
+            while True:
+                rows = self.get_attendance_page(filters, after, chunk_size, sort, descending)
+                if rows:
+                    yield rows
+                if len(rows) < chunk_size:
+                    return
+                after = self.attendance_sort_key(rows[-1], sort)
 
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+        for _, _, partition in reversed(sources) if descending else sources:
+            with self.pool.read() as conn:
+                query, values = self._attendance_query(filters, None, sort, descending, self._attach(conn, partition))
+                cursor = conn.execute(query, values)
+                try:
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield [row[:3] for row in rows]
+                finally:
+                    cursor.close()
 
-        query += " ORDER BY timestamp DESC"
+    @staticmethod
+    def _attendance_query(filters, after, sort, descending, schema="main") -> tuple[str, list]:
+        keys = ATTENDANCE_SORT_KEYS[sort]
+        where, values = (filters or AttendanceFilter()).where()
+        if after is not None:
+            # Row-value comparison lets SQLite seek in the index instead of skipping OFFSET rows
+            clause = f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' for _ in keys)})"
+            where += (" AND " if where else " WHERE ") + clause
+            values.extend(after)
+        direction = "DESC" if descending else "ASC"
+        # a.ts is returned as well, to merge rows of several databases in sort order
+        return ("SELECT a.id, f.name, datetime(a.ts, 'unixepoch', 'localtime'), a.ts "
+                f"FROM {schema}.attendance a JOIN main.faces f ON f.id = a.person_id{where} ORDER BY "
+                + ", ".join(f"{key} {direction}" for key in keys)), values
 
-        self.cursor.execute(query, values)
-        return self.cursor.fetchall()
+    @staticmethod
+    def attendance_sort_key(row: tuple, sort: str = "timestamp") -> tuple:
+        """Keyset position of an (id, name, timestamp) row for get_attendance_page(after=...)."""
+        # The local time stands in for ts, which get_attendance_page looks up exactly by id
+        columns = {"a.id": row[0], "f.name": row[1], "a.ts": row[2]}
+        return tuple(columns[key] for key in ATTENDANCE_SORT_KEYS[sort])
+
+    def _resolve_sort_key(self, key: tuple, sort: str) -> Optional[tuple]:
+        """attendance_sort_key() with the row's ts filled in, or None if the row is gone."""
+        keys = ATTENDANCE_SORT_KEYS[sort]
+        located = self._locate_attendance(key[-1], key[keys.index("a.ts")][:10])
+        if located is None:
+            return None
+        return tuple(located[1] if name == "a.ts" else value for name, value in zip(keys, key))
+
+    def _locate_attendance(self, record_id: int, day: Optional[str] = None) -> Optional[
+            tuple[Optional[Partition], int]]:
+        """
+        (archive holding the record or None for the main database, its ts), or None if
+        not found. Knowing the record's local day limits the search to the archives of that day.
+        """
+        row = self._fetchone("SELECT ts FROM attendance WHERE id = ?", (record_id,))
+        if row:
+            return None, row[0]
+        for partition in self.archive_partitions(*(day_range(day) if day else ())):
+            with self.pool.read() as conn:
+                row = conn.execute(f"SELECT ts FROM {self._attach(conn, partition)}.attendance WHERE id = ?",
+                                   (record_id,)).fetchone()
+            if row:
+                return partition, row[0]
+        return None
 
     def get_attendance_records_with_id(self) -> list[tuple[int, str, str]]:
-        self.cursor.execute("SELECT id, name, timestamp FROM attendance ORDER BY timestamp DESC")
-        return self.cursor.fetchall()
+        return self.get_attendance_page(limit=None)
 
     def delete_attendance_record_by_id(self, record_id: int) -> bool:
-        self.cursor.execute("DELETE FROM attendance WHERE id = ?", (record_id,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
-
-    def search_attendance(self, keyword: str) -> list[tuple[int, str, str]]:
-        pattern = f"%{keyword}%"
-        self.cursor.execute("""
-            SELECT id, name, timestamp FROM attendance
-            WHERE name LIKE ? OR timestamp LIKE ?
-            ORDER BY timestamp DESC
-        """, (pattern, pattern))
-        return self.cursor.fetchall()
+        located = self._locate_attendance(record_id)
+        if located is None:
+            return False
+        partition, ts = located
+        day = datetime.fromtimestamp(ts).strftime(DATE_FORMAT)
+        # The day's rollup is recomputed from its raw rows in the main database and any archive
+        archives = self.archive_partitions(*day_range(day))
+        with self.pool.write() as conn:
+            # ATTACH is not allowed inside a transaction, so before the DELETE opens one
+            schemas = ["main"] + [self._attach(conn, archive) for archive in archives]
+            table = f"{self._attach(conn, partition)}.attendance"
+            row = conn.execute(f"SELECT person_id FROM {table} WHERE id = ?", (record_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,))
+            if partition is not None:
+                conn.execute("UPDATE attendance_partitions SET rows = rows - 1 WHERE name = ?", (partition.name,))
+            refresh_daily(conn, row[0], day, schemas)
+        return True
+
+    def get_attendance_summary(self, date_from: str, date_to: str) -> tuple[int, list[tuple]]:
+        """
+        Per-person attendance between two days (inclusive), from the daily rollups only.
+
+        Returns:
+            tuple: (number of days on which anyone signed in, rows of
+            (name, days present, sign-ins, first seen, last seen)).
+        """
+        values = (date_from, date_to)
+        session_days = self._fetchone(
+            "SELECT COUNT(DISTINCT date) FROM attendance_daily WHERE date BETWEEN ? AND ?", values)[0]
+        rows = self._fetchall("""
+            SELECT f.name, COUNT(*), SUM(d.count),
+                   datetime(MIN(d.first_seen), 'unixepoch', 'localtime'),
+                   datetime(MAX(d.last_seen), 'unixepoch', 'localtime')
+            FROM attendance_daily d JOIN faces f ON f.id = d.person_id
+            WHERE d.date BETWEEN ? AND ?
+            GROUP BY d.person_id ORDER BY f.name
+        """, values)
+        return session_days, rows
+
+    def rebuild_attendance_rollups(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> int:
+        """
+        Recompute the daily rollups of a day range (all days by default) from the raw
+        records in the main database and the archives.
+        """
+        archives = self.archive_partitions(day_range(date_from)[0] if date_from else None,
+                                           day_range(date_to)[1] if date_to else None)
+        with self.pool.write() as conn:
+            # Archives are attached one by one while only reading; the rollups are
+            # replaced at the end, in one transaction
+            aggregates = []
+            for partition in [None] + archives:
+                aggregates.extend(daily_aggregates(conn, self._attach(conn, partition), date_from, date_to))
+            clear_daily(conn, date_from, date_to)
+            merge_daily(conn, aggregates)
+        return len(aggregates)
+
+    def archive_partitions(self, low: Optional[int] = None, high: Optional[int] = None) -> list[Partition]:
+        """Archives holding rows with low <= ts < high (either may be None), oldest first."""
+        rows = self._fetchall("""
+            SELECT name, path, start_ts, end_ts, rows FROM attendance_partitions
+            WHERE end_ts > ? AND start_ts < ? ORDER BY start_ts
+        """, (low if low is not None else -2 ** 63, high if high is not None else 2 ** 63 - 1))
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        return [Partition(name, os.path.join(directory, path), start, end, count)
+                for name, path, start, end, count in rows]
+
+    @staticmethod
+    def _attach(conn, partition: Optional[Partition]) -> str:
+        """
+        Schema under which the partition's attendance table is reachable on conn
+        ('main' for None), attaching the archive first if needed.
+        """
+        if partition is None:
+            return "main"
+        attached = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("archive_")]
+        if partition.schema not in attached:
+            if len(attached) >= MAX_ATTACHED_ARCHIVES:
+                for schema in attached:
+                    conn.execute(f"DETACH DATABASE {schema}")
+            conn.execute(f"ATTACH DATABASE ? AS {partition.schema}", (partition.path,))
+        return partition.schema
+
+    def archive_attendance(self, before: str, period: str = "month") -> list[tuple[str, int]]:
+        """
+        Move attendance older than the day before ('YYYY-MM-DD') into one archive
+        database per month or year, see attendance_archive.
+
+        Returns:
+            list: (partition name, rows moved) per period.
+        """
+        cutoff = day_range(before)[0]
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        moved = []
+        oldest = self._fetchone("SELECT MIN(ts) FROM attendance WHERE ts < ?", (cutoff,))[0]
+        while oldest is not None:
+            name, start, end = period_bounds(oldest, period)
+            if any(partition.name != name for partition in self.archive_partitions(start, end)):
+                raise ValueError(f"{name} overlaps archives of another period; archive by the same period")
+            path = archive_file_name(self.db_path, name)
+            partition = Partition(name, os.path.join(directory, path), start, end, 0)
+            with self.pool.write() as conn:
+                schema = self._attach(conn, partition)
+                create_archive_schema(conn, schema)
+                # Rows already archived by an interrupted run are skipped by id
+                count = conn.execute(f"""
+                    INSERT OR IGNORE INTO {schema}.attendance (id, person_id, ts)
+                    SELECT id, person_id, ts FROM main.attendance WHERE ts >= ? AND ts < ? ORDER BY id
+                """, (start, min(end, cutoff))).rowcount
+                conn.execute("DELETE FROM main.attendance WHERE ts >= ? AND ts < ?", (start, min(end, cutoff)))
+                conn.execute(f"ANALYZE {schema}")  # Archives need their own planner statistics
+                conn.execute("""
+                    INSERT INTO attendance_partitions (name, path, start_ts, end_ts, rows) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET rows = rows + excluded.rows
+                """, (name, path, start, end, count))
+            moved.append((name, count))
+            oldest = self._fetchone("SELECT MIN(ts) FROM attendance WHERE ts >= ? AND ts < ?", (end, cutoff))[0]
+        return moved
+
+    def compact(self):
+        """Return the space freed in the main database (e.g. by archiving) to the OS."""
+        with self.pool.write() as conn:
+            conn.execute("VACUUM main")
+
+    def search_attendance(self, keyword: str, limit: Optional[int] = ATTENDANCE_PAGE_SIZE) -> list[
+        tuple[int, str, str]]:
+        """Newest records matching a search string such as 'alice 2026-03', capped to limit rows."""
+        return self.get_attendance_page(AttendanceFilter(keyword=keyword), limit=limit)
 
     def get_all_users(self) -> list[tuple[str, str]]:
-        self.cursor.execute("SELECT username, role FROM users ORDER BY username ASC")
-        return self.cursor.fetchall()
+        return self._fetchall("SELECT username, role FROM users ORDER BY username ASC")
 
     def update_user_role(self, username: str, new_role: str) -> bool:
-        self.cursor.execute("UPDATE users SET role = ? WHERE username = ?", (new_role, username))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        return self._execute("UPDATE users SET role = ? WHERE username = ?", (new_role, username)) > 0
 
     def get_user_role(self, username: str, password: str) -> Optional[str]:
-        self.cursor.execute(
+        row = self._fetchone(
             "SELECT role FROM users WHERE username = ? AND password = ?",
             (username, password)
         )
-        row = self.cursor.fetchone()
         return row[0] if row else None
 
     def add_user(self, username: str, password: str, role: str) -> bool:
         try:
-            self.cursor.execute(
+            self._execute(
                 "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
                 (username, password, role)
             )
-            self.conn.commit()
             return True
         except sqlite3.IntegrityError:
             return False
 
     def close(self):
-        self.conn.close()
+        if self.pool is not None:
+            release_pool(self.pool)
+            self.pool = None
@@ -0,0 +1,229 @@
+"""
+Versioned on-disk format for face embeddings (the faces.embedding column).
+
+Layout, little-endian:
+
+    magic  b"FEMB"
+    u8     format version (1)
+    u8     storage dtype code (0 = float32, 1 = float16, 2 = int8)
+    u8     flags (bit 0: vector was L2-normalized before storage)
+    u16    dimension
+    u8     length of the model id, followed by the ASCII model id
+    f32    scale (int8 only: value = stored * scale)
+    ...    dimension values of the storage dtype
+
+Blobs written before the format existed are raw float32 bytes; they are still
+decoded, and migrate_embeddings() rewrites them in place:
+
+    python embedding_codec.py attendance_system.db --dtype float16
+"""
+import argparse
+import os
+import sqlite3
+import struct
+
+import numpy as np
+
+MAGIC = b"FEMB"
+FORMAT_VERSION = 1
+EMBEDDING_MODEL_ID = "facenet-vggface2"
+EMBEDDING_DIM = 512
+# Storage dtype for new rows: float16 halves the size, int8 quarters it
+EMBEDDING_STORAGE_DTYPE = os.environ.get("EMBEDDING_STORAGE_DTYPE", "float16")
+
+_DTYPES = {"float32": (0, np.float32), "float16": (1, np.float16), "int8": (2, np.int8)}
+_DTYPE_NAMES = {code: name for name, (code, _) in _DTYPES.items()}
+_HEADER = struct.Struct("<4sBBBHB")
+_SCALE = struct.Struct("<f")
+FLAG_NORMALIZED = 1
+
+
+class EmbeddingFormatError(ValueError):
+    """Raised when a stored embedding blob is corrupt or does not fit the gallery."""
+
+
+def _to_array(embedding):
+    if hasattr(embedding, "detach"):
+        embedding = embedding.detach().cpu().numpy()
+    return np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+
+def split_embeddings(embeddings):
+    """
+    Turn one embedding or a batch of them (NxD tensor/array, list of tensors,
+    arrays or blobs) into a list of 1-D float32 arrays.
+    """
+    if isinstance(embeddings, (list, tuple)):
+        return [vector for item in embeddings for vector in split_embeddings(item)]
+    if isinstance(embeddings, (bytes, bytearray, memoryview)):
+        return [decode_embedding(embeddings, model_id=None)]
+    if hasattr(embeddings, "detach"):
+        embeddings = embeddings.detach().cpu().numpy()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return list(embeddings.reshape(-1, embeddings.shape[-1]))
+
+
+def is_encoded(blob):
+    return bytes(blob[:len(MAGIC)]) == MAGIC
+
+
+def encode_embedding(embedding, dtype=EMBEDDING_STORAGE_DTYPE, model_id=EMBEDDING_MODEL_ID, normalize=True):
+    """
+    Serialize an embedding for the faces table.
+
+    Args:
+        embedding: torch.Tensor, np.ndarray, or an already stored blob (legacy
+            raw float32 bytes are re-encoded, encoded blobs returned unchanged).
+        dtype (str): "float32", "float16" or "int8".
+        model_id (str): Identifier of the model that produced the embedding.
+        normalize (bool): L2-normalize before storing (matching is cosine anyway).
+
+    Returns:
+        bytes: The encoded blob.
+    """
+    if isinstance(embedding, (bytes, bytearray, memoryview)):
+        if is_encoded(embedding):
+            return bytes(embedding)
+        embedding = decode_embedding(embedding, model_id=None)
+
+    if dtype not in _DTYPES:
+        raise ValueError(f"Unknown embedding storage dtype: {dtype}")
+    vector = _to_array(embedding)
+    if normalize:
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+    code, np_dtype = _DTYPES[dtype]
+    model = model_id.encode("ascii")
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, code, FLAG_NORMALIZED if normalize else 0, vector.size, len(model)), model]
+    if dtype == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        parts.append(_SCALE.pack(scale))
+        vector = np.round(vector / scale)
+    parts.append(vector.astype(np_dtype).tobytes())
+    return b"".join(parts)
+
+
+def decode_embedding(blob, expected_dim=None, model_id=EMBEDDING_MODEL_ID):
+    """
+    Parse and validate a stored embedding.
+
+    Args:
+        blob (bytes): Value of faces.embedding.
+        expected_dim (int): Reject vectors of any other dimension.
+        model_id (str): Reject vectors from any other model; None accepts any.
+
+    Returns:
+        np.ndarray: The embedding as a 1-D float32 array.
+
+    Raises:
+        EmbeddingFormatError: If the blob is truncated, corrupt or does not match.
+    """
+    blob = bytes(blob)
+    if not is_encoded(blob):
+        # Legacy row: raw float32 bytes of unknown origin
+        if not blob or len(blob) % 4:
+            raise EmbeddingFormatError(f"Legacy embedding of {len(blob)} bytes is not float32 data")
+        vector = np.frombuffer(blob, dtype=np.float32)
+    else:
+        if len(blob) < _HEADER.size:
+            raise EmbeddingFormatError("Truncated embedding header")
+        _, version, code, _, dim, model_len = _HEADER.unpack_from(blob)
+        if version != FORMAT_VERSION:
+            raise EmbeddingFormatError(f"Unsupported embedding format version {version}")
+        if code not in _DTYPE_NAMES:
+            raise EmbeddingFormatError(f"Unknown embedding dtype code {code}")
+        offset = _HEADER.size + model_len
+        stored_model = blob[_HEADER.size:offset].decode("ascii", errors="replace")
+        if model_id is not None and stored_model != model_id:
+            raise EmbeddingFormatError(f"Embedding from model {stored_model!r}, expected {model_id!r}")
+
+        dtype_name = _DTYPE_NAMES[code]
+        scale = 1.0
+        if dtype_name == "int8":
+            if len(blob) < offset + _SCALE.size:
+                raise EmbeddingFormatError("Truncated int8 scale")
+            (scale,) = _SCALE.unpack_from(blob, offset)
+            offset += _SCALE.size
+        np_dtype = _DTYPES[dtype_name][1]
+        if len(blob) - offset != dim * np.dtype(np_dtype).itemsize:
+            raise EmbeddingFormatError(f"Embedding payload does not hold {dim} {dtype_name} values")
+        vector = np.frombuffer(blob, dtype=np_dtype, offset=offset).astype(np.float32)
+        if scale != 1.0:
+            vector *= scale
+
+    if expected_dim is not None and vector.size != expected_dim:
+        raise EmbeddingFormatError(f"Embedding has {vector.size} values, expected {expected_dim}")
+    if not np.all(np.isfinite(vector)):
+        raise EmbeddingFormatError("Embedding contains NaN or infinite values")
+    return vector
+
+
+def describe_embedding(blob):
+    """Return (dtype, dim, normalized, model_id) of a blob; legacy rows report model_id None."""
+    blob = bytes(blob)
+    if not is_encoded(blob):
+        return "float32", len(blob) // 4, False, None
+    _, _, code, flags, dim, model_len = _HEADER.unpack_from(blob)
+    model_id = blob[_HEADER.size:_HEADER.size + model_len].decode("ascii", errors="replace")
+    return _DTYPE_NAMES.get(code, "unknown"), dim, bool(flags & FLAG_NORMALIZED), model_id
+
+
+def migrate_embeddings(conn, dtype=EMBEDDING_STORAGE_DTYPE, model_id=EMBEDDING_MODEL_ID, table="faces"):
+    """
+    Rewrite every row of table into the current format and storage dtype in one
+    transaction. Rows that cannot be decoded are left untouched and reported.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to the attendance database.
+        table (str): "faces" or "face_embeddings".
+
+    Returns:
+        tuple: (rewritten, skipped) row counts.
+    """
+    # Empty blobs are placeholders of people who were never enrolled (see migrations.py)
+    rows = conn.execute(f"SELECT id, {'name' if table == 'faces' else 'face_id'}, embedding FROM {table} "
+                        "WHERE length(embedding) > 0").fetchall()
+    updates, skipped = [], 0
+    for row_id, name, blob in rows:
+        try:
+            if is_encoded(blob) and describe_embedding(blob)[0] == dtype:
+                continue
+            vector = decode_embedding(blob, model_id=None)
+        except EmbeddingFormatError as e:
+            print(f"[DEBUG] Not migrating embedding of {name}: {e}")
+            skipped += 1
+            continue
+        updates.append((encode_embedding(vector, dtype, model_id), row_id))
+
+    own_transaction = not conn.in_transaction  # Inside a migration the caller commits
+    conn.executemany(f"UPDATE {table} SET embedding = ? WHERE id = ?", updates)
+    if own_transaction:
+        conn.commit()
+    return len(updates), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite stored face embeddings into the versioned format.")
+    parser.add_argument("db_path", nargs="?", default="attendance_system.db")
+    parser.add_argument("--dtype", choices=list(_DTYPES), default=EMBEDDING_STORAGE_DTYPE)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('faces', 'face_embeddings')")]
+        for table in tables:
+            size = f"SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM {table}"
+            before = conn.execute(size).fetchone()[0]
+            rewritten, skipped = migrate_embeddings(conn, args.dtype, table=table)
+            after = conn.execute(size).fetchone()[0]
+            print(f"{table}: rewrote {rewritten} embeddings as {args.dtype} ({skipped} skipped); "
+                  f"embedding bytes {before} -> {after}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
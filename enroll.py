@@ -0,0 +1,253 @@
+"""
+Headless bulk enrolment from a folder of photos or a CSV manifest.
+
+    python -m enroll photos/                # photos/<name>/*.jpg or photos/<name>.jpg
+    python -m enroll intake.csv             # CSV with name,path columns (paths relative to the CSV)
+    python -m enroll photos/ --multi largest --workers 8 --batch 32
+
+Images are decoded on a thread pool while the previous batch is detected and
+embedded. Results are checkpointed to <source>.enroll-progress.jsonl, so an
+interrupted run resumes where it stopped, and everything is written to the
+database in one transaction at the end. Images without a usable face are
+listed in <source>.enroll-report.csv.
+"""
+import argparse
+import base64
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from database import DATABASE_PATH, DatabaseManager
+from embedding_codec import encode_embedding
+from face_backends import list_images
+
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+BATCH_SIZE = 32  # Images per detection/embedding batch
+DETECT_MAX_SIDE = 1024  # Photos are downscaled to this for detection; faces are cropped at full size
+
+
+def collect_sources(source):
+    """
+    List (name, path) pairs to enrol.
+
+    A directory may hold one subfolder per person (every image in it is a
+    sample) or images named after the person. A CSV needs name and path columns.
+    """
+    if os.path.isdir(source):
+        entries = []
+        for path in list_images(source):
+            parent = os.path.dirname(os.path.relpath(path, source))
+            name = parent.split(os.sep)[0] if parent else os.path.splitext(os.path.basename(path))[0]
+            entries.append((name, path))
+        return entries
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="", encoding="utf-8") as f:
+        return [(row["name"].strip(), os.path.join(base, row["path"].strip()))
+                for row in csv.DictReader(f) if row.get("name") and row.get("path")]
+
+
+def load_progress(progress_path):
+    """
+    Read a progress file.
+
+    Returns:
+        tuple: (committed paths, pending records by path). Records before the
+        last commit marker are already in the database.
+    """
+    committed, pending = set(), {}
+    if not os.path.exists(progress_path):
+        return committed, pending
+    with open(progress_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn line from an interrupted run; that image is redone
+            if record.get("committed"):
+                committed.update(pending)
+                pending.clear()
+            else:
+                pending[record["path"]] = record
+    return committed, pending
+
+
+def decode_image(path):
+    image = cv2.imread(path)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image is not None else None
+
+
+def detect_batch(images):
+    """
+    Detect faces in a batch of RGB images, largest face first per image.
+
+    Images are downscaled to DETECT_MAX_SIDE and grouped by size, so MTCNN
+    runs once per group of same-sized photos (the common case for one camera).
+    Boxes are returned in full-resolution coordinates.
+    """
+    from face_models import get_mtcnn
+
+    detector = get_mtcnn()
+    results = [None] * len(images)
+    groups = defaultdict(list)
+    for i, image in enumerate(images):
+        height, width = image.shape[:2]
+        scale = min(1.0, DETECT_MAX_SIDE / max(height, width))
+        small = cv2.resize(image, (round(width * scale), round(height * scale)),
+                           interpolation=cv2.INTER_AREA) if scale < 1.0 else image
+        groups[small.shape].append((i, small, scale))
+
+    for members in groups.values():
+        batch = [small for _, small, _ in members]
+        boxes_list, _ = detector.detect(batch if len(batch) > 1 else batch[0])
+        if len(batch) == 1:
+            boxes_list = [boxes_list]
+        for (i, _, scale), boxes in zip(members, boxes_list):
+            if boxes is None or len(boxes) == 0:
+                continue
+            boxes = np.asarray(boxes, dtype=np.float32) / scale
+            areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            results[i] = boxes[np.argsort(-areas)]
+    return results
+
+
+def process_batch(batch, multi_face):
+    """
+    Detect and embed one batch of (name, path, image) entries.
+
+    Returns:
+        list: One progress record per entry.
+    """
+    from face_models import crop_faces, embed_faces
+
+    records, crops, crop_records = [], [], []
+    readable = [(name, path, image) for name, path, image in batch if image is not None]
+    detections = detect_batch([image for _, _, image in readable]) if readable else []
+    boxes_by_path = {path: boxes for (_, path, _), boxes in zip(readable, detections)}
+
+    for name, path, image in batch:
+        record = {"path": path, "name": name, "faces": 0}
+        boxes = boxes_by_path.get(path)
+        if image is None:
+            record["status"] = "unreadable"
+        elif boxes is None:
+            record["status"] = "no_face"
+        else:
+            record["faces"] = len(boxes)
+            if len(boxes) > 1 and multi_face == "skip":
+                record["status"] = "multiple_faces"
+            else:
+                record["status"] = "ok" if len(boxes) == 1 else "ok_largest_of_many"
+                crops.append(crop_faces(image, boxes[:1]))
+                crop_records.append(record)
+        records.append(record)
+
+    if crops:
+        import torch
+        embeddings = embed_faces(torch.cat(crops)).cpu().numpy()
+        for record, embedding in zip(crop_records, embeddings):
+            record["embedding"] = base64.b64encode(encode_embedding(embedding)).decode("ascii")
+    return records
+
+
+def enroll(source, db_path=DATABASE_PATH, batch_size=BATCH_SIZE, workers=DECODE_WORKERS, multi_face="skip"):
+    """
+    Enrol every image of source and print a report with throughput stats.
+
+    Returns:
+        dict: Counts per status plus people added/extended and timings.
+    """
+    prefix = source.rstrip("/\\")
+    progress_path = prefix + ".enroll-progress.jsonl"
+    report_path = prefix + ".enroll-report.csv"
+
+    entries = collect_sources(source)
+    committed, pending = load_progress(progress_path)
+    todo = [(name, path) for name, path in entries if path not in committed and path not in pending]
+    print(f"{len(entries)} images: {len(committed)} already enrolled, {len(pending)} processed "
+          f"but not written, {len(todo)} to process.")
+
+    start = time.perf_counter()
+    timings = defaultdict(float)
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    with ThreadPoolExecutor(workers) as pool, open(progress_path, "a", encoding="utf-8") as progress:
+        # Decode the next batch while the current one is in the models
+        next_images = pool.map(decode_image, [path for _, path in batches[0]]) if batches else None
+        for b, batch in enumerate(batches):
+            t = time.perf_counter()
+            images = list(next_images)
+            timings["decode_wait"] += time.perf_counter() - t
+            if b + 1 < len(batches):
+                next_images = pool.map(decode_image, [path for _, path in batches[b + 1]])
+
+            t = time.perf_counter()
+            records = process_batch([(name, path, image) for (name, path), image in zip(batch, images)],
+                                    multi_face)
+            timings["detect_embed"] += time.perf_counter() - t
+            for record in records:
+                progress.write(json.dumps(record) + "\n")
+                pending[record["path"]] = record
+            progress.flush()
+
+            done = (b + 1) * batch_size
+            elapsed = time.perf_counter() - start
+            print(f"  {min(done, len(todo))}/{len(todo)} images, {min(done, len(todo)) / elapsed:.1f} img/s")
+
+        samples = defaultdict(list)
+        for record in pending.values():
+            if "embedding" in record:
+                samples[record["name"]].append(base64.b64decode(record["embedding"]))
+
+        t = time.perf_counter()
+        db = DatabaseManager(db_path)
+        try:
+            added, extended = db.enroll_faces(samples) if samples else (0, 0)
+        finally:
+            db.close()
+        timings["db_write"] = time.perf_counter() - t
+        progress.write(json.dumps({"committed": True}) + "\n")
+
+    counts = defaultdict(int)
+    for record in pending.values():
+        counts[record["status"]] += 1
+    problems = [record for record in pending.values() if "embedding" not in record or record["faces"] > 1]
+    if problems:
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["path", "name", "status", "faces"])
+            for record in problems:
+                writer.writerow([record["path"], record["name"], record["status"], record["faces"]])
+
+    total = time.perf_counter() - start
+    print(f"Enrolled {sum(len(v) for v in samples.values())} samples: {added} new people, "
+          f"{extended} existing people extended.")
+    if counts:
+        print("Status: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    if problems:
+        print(f"{len(problems)} images need attention, see {report_path}")
+    print(f"Throughput: {len(todo) / total if total else 0:.1f} img/s over {total:.1f}s "
+          f"(decode wait {timings['decode_wait']:.1f}s, detect+embed {timings['detect_embed']:.1f}s, "
+          f"db write {timings['db_write']:.2f}s)")
+    return {**counts, "added": added, "extended": extended, "seconds": total}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrol a folder of photos or a CSV manifest of faces.")
+    parser.add_argument("source", help="directory of photos or CSV manifest with name,path columns")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="images per detection/embedding batch")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="image decoding threads")
+    parser.add_argument("--multi", choices=["skip", "largest"], default="skip",
+                        help="what to do with photos showing more than one face")
+    args = parser.parse_args(argv)
+    enroll(args.source, args.db, args.batch, args.workers, args.multi)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Compiled and quantized CPU backends for the face models.
+
+The embedding network (and the MTCNN P/R/O nets) can be exported once to
+TorchScript or ONNX, or quantized to int8, cached on disk under MODEL_CACHE_DIR
+and served from the faster runtime. face_models picks the backend from FACE_BACKEND.
+
+    python face_backends.py check {torchscript,onnx,int8} [image ...]
+    python face_backends.py calibrate <enrolment image dir>
+    python face_backends.py evaluate <image dir> [--db attendance_system.db]
+"""
+import argparse
+import copy
+import glob
+import inspect
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+BACKENDS = ("eager", "torchscript", "onnx", "int8")
+MODEL_CACHE_DIR = os.environ.get("FACE_MODEL_CACHE", "model_cache")
+PARITY_TOLERANCE = 1e-3  # Max cosine distance between eager and compiled embeddings
+INT8_TOLERANCE = 0.05  # Quantization is lossy; the evaluate command reports the real impact
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+PARITY_SAMPLES = 8
+EMBEDDER_NAME = "inception_resnet_v1_vggface2"
+
+
+def _cache_path(filename):
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    return os.path.join(MODEL_CACHE_DIR, filename)
+
+
+class OnnxEmbedder:
+    """Callable with the same contract as InceptionResnetV1: Nx3x160x160 tensor in, Nx512 out."""
+
+    def __init__(self, path):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("The onnx backend needs the optional 'onnxruntime' package") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, faces):
+        output = self.session.run(None, {self.input_name: faces.detach().cpu().numpy().astype(np.float32)})[0]
+        return torch.from_numpy(output)
+
+    def eval(self):
+        return self
+
+
+def export_torchscript(model, device):
+    """
+    Trace and freeze the embedding network (cached on disk), then fuse it for inference.
+
+    optimize_for_inference output cannot be serialized, so it is applied after loading.
+    """
+    path = _cache_path(f"{EMBEDDER_NAME}.ts.pt")
+    if not os.path.exists(path):
+        example = torch.zeros(2, 3, 160, 160, device=device)
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(model.eval(), example))
+        traced.save(path)
+        print(f"[DEBUG] Exported TorchScript embedder to {path}")
+    return torch.jit.optimize_for_inference(torch.jit.load(path, map_location=device).eval())
+
+
+def export_onnx(model, device):
+    """Export the embedding network to ONNX (dynamic batch) and open it with ONNX Runtime."""
+    path = _cache_path(f"{EMBEDDER_NAME}.onnx")
+    if not os.path.exists(path):
+        example = torch.zeros(1, 3, 160, 160, device=device)
+        kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            kwargs["dynamo"] = False  # The TorchScript-based exporter needs no extra packages
+        torch.onnx.export(model.eval(), example, path, input_names=["faces"], output_names=["embeddings"],
+                          dynamic_axes={"faces": {0: "batch"}, "embeddings": {0: "batch"}},
+                          opset_version=13, **kwargs)
+        print(f"[DEBUG] Exported ONNX embedder to {path}")
+    return OnnxEmbedder(path)
+
+
+def compile_detector(mtcnn, device):
+    """
+    Swap the MTCNN P/R/O nets for cached TorchScript versions.
+
+    The nets are scripted rather than frozen: facenet-pytorch reads their parameter
+    dtype, and P-Net has to accept any input size.
+    """
+    for name in ("pnet", "rnet", "onet"):
+        path = _cache_path(f"mtcnn_{name}.ts.pt")
+        if not os.path.exists(path):
+            torch.jit.script(getattr(mtcnn, name).eval()).save(path)
+        setattr(mtcnn, name, torch.jit.load(path, map_location=device))
+    return mtcnn
+
+
+def quantize_int8(eager, calibration_faces):
+    """
+    Statically quantize the embedding network to int8 (FX graph mode) and cache it.
+
+    Args:
+        eager (nn.Module): Float32 InceptionResnetV1 on the CPU.
+        calibration_faces (torch.Tensor): Nx3x160x160 standardized crops, ideally of
+            the enrolled people, used to pick activation ranges.
+
+    Returns:
+        torch.jit.ScriptModule: The quantized network.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+    model = copy.deepcopy(eager).cpu().eval()
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (calibration_faces[:1],))
+    with torch.no_grad():
+        for batch in torch.split(calibration_faces, 32):
+            prepared(batch)
+        quantized = torch.jit.trace(convert_fx(prepared), calibration_faces[:2])
+
+    path = _cache_path(f"{EMBEDDER_NAME}.int8.ts.pt")
+    quantized.save(path)
+    print(f"[DEBUG] Saved int8 embedder calibrated on {len(calibration_faces)} faces to {path}")
+    return quantized
+
+
+def load_int8(eager, device):
+    """
+    Load the calibrated int8 embedder, or fall back to dynamic quantization
+    (linear layers only, no calibration needed) if none has been built yet.
+    """
+    if device.type != "cpu":
+        raise RuntimeError("int8 models only run on the CPU")
+    path = _cache_path(f"{EMBEDDER_NAME}.int8.ts.pt")
+    if os.path.exists(path):
+        return torch.jit.load(path, map_location="cpu")
+    print("[DEBUG] No calibrated int8 model; run `python face_backends.py calibrate <dir>`. "
+          "Using dynamic quantization.")
+    return torch.ao.quantization.quantize_dynamic(copy.deepcopy(eager).eval(), {torch.nn.Linear},
+                                                  dtype=torch.qint8)
+
+
+def model_size(model):
+    """Serialized size of a model in bytes (packed int8 weights are not in state_dict)."""
+    buffer = io.BytesIO()
+    if isinstance(model, torch.jit.ScriptModule):
+        torch.jit.save(model, buffer)
+    else:
+        torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def _time_model(model, faces, repeats=3):
+    with torch.no_grad():
+        model(faces[:1])  # Warm-up
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(faces)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def evaluate_int8(eager, quantized, faces, labels=None, db_path=None):
+    """
+    Compare the int8 embedder against float32 on the same crops.
+
+    Speed and weight size are measured directly. Both sets of embeddings are then
+    matched against the enrolled gallery, as the app would match them (by default
+    every face_embeddings sample, stored as EMBEDDING_STORAGE_DTYPE, usually
+    float16). The float32 figures therefore include the storage error; the
+    difference between the float32 and int8 figures is the int8 drift.
+
+    Args:
+        faces (torch.Tensor): Nx3x160x160 standardized crops.
+        labels (list): Optional expected name per crop (e.g. the file name).
+        db_path (str): Database whose enrolled faces are the reference gallery.
+
+    Returns:
+        dict: The report.
+    """
+    from match_faces import EmbeddingGallery, THRESHOLD, DATABASE_PATH
+
+    float_time = _time_model(eager, faces)
+    int8_time = _time_model(quantized, faces)
+    with torch.no_grad():
+        float_embeddings = eager(faces)
+        int8_embeddings = quantized(faces)
+    drift = (1 - F.cosine_similarity(float_embeddings, int8_embeddings, dim=1)).numpy()
+
+    gallery = EmbeddingGallery(db_path or DATABASE_PATH)
+    try:
+        gallery_size = len(gallery)
+        float_matches = gallery.match_many(float_embeddings)
+        int8_matches = gallery.match_many(int8_embeddings)
+    finally:
+        gallery.close()
+
+    report = {
+        "faces": len(faces),
+        "gallery_size": gallery_size,
+        "float32_ms_per_face": 1000 * float_time / len(faces),
+        "int8_ms_per_face": 1000 * int8_time / len(faces),
+        "speedup": float_time / int8_time,
+        "float32_weight_mb": model_size(eager) / 2 ** 20,
+        "int8_weight_mb": model_size(quantized) / 2 ** 20,
+        "embedding_drift_p50": float(np.median(drift)),
+        "embedding_drift_max": float(drift.max()),
+    }
+    report["memory_saved_mb"] = report["float32_weight_mb"] - report["int8_weight_mb"]
+
+    for key, matches in (("float32", float_matches), ("int8", int8_matches)):
+        distances = np.array([distance for _, distance in matches])
+        report[f"{key}_match_rate"] = float(np.mean(distances < THRESHOLD))
+        report[f"{key}_distance_p10_p50_p90"] = [float(v) for v in np.percentile(distances, [10, 50, 90])]
+        if labels is not None:
+            report[f"{key}_accuracy"] = float(np.mean([
+                name == label and distance < THRESHOLD for (name, distance), label in zip(matches, labels)
+            ]))
+    report["top1_agreement"] = float(np.mean([a[0] == b[0] for a, b in zip(float_matches, int8_matches)]))
+    report["mean_distance_shift"] = float(np.mean([b[1] - a[1] for a, b in zip(float_matches, int8_matches)]))
+    return report
+
+
+def check_parity(eager, compiled, faces=None, tolerance=PARITY_TOLERANCE):
+    """
+    Compare embeddings of the eager and compiled networks.
+
+    Args:
+        faces (torch.Tensor): Nx3x160x160 standardized crops; random ones if omitted.
+
+    Returns:
+        tuple: (ok, max_cosine_distance)
+    """
+    if faces is None:
+        generator = torch.Generator().manual_seed(0)
+        faces = torch.rand(PARITY_SAMPLES, 3, 160, 160, generator=generator) * 2 - 1
+    faces = faces.to(next(eager.parameters()).device)
+    with torch.no_grad():
+        reference = eager(faces)
+        candidate = compiled(faces).to(reference.device)
+    distances = 1 - F.cosine_similarity(reference, candidate, dim=1)
+    max_distance = float(distances.max())
+    return max_distance <= tolerance, max_distance
+
+
+def _export(backend, eager, device):
+    if backend == "torchscript":
+        return export_torchscript(eager, device)
+    if backend == "onnx":
+        return export_onnx(eager, device)
+    return load_int8(eager, device)
+
+
+def load_embedder(backend, eager, device, faces=None):
+    """
+    Return the embedding network for backend, exporting it on first use.
+
+    Falls back to the eager model (with a message) if export fails or the compiled
+    model does not pass the parity check, so THRESHOLD stays valid either way.
+    """
+    if backend == "eager":
+        return eager
+    if backend not in BACKENDS:
+        print(f"[DEBUG] Unknown face backend '{backend}', using eager.")
+        return eager
+
+    try:
+        compiled = _export(backend, eager, device)
+        tolerance = INT8_TOLERANCE if backend == "int8" else PARITY_TOLERANCE
+        ok, max_distance = check_parity(eager, compiled, faces, tolerance)
+    except Exception as e:
+        print(f"[DEBUG] {backend} backend unavailable ({e}), using eager.")
+        return eager
+
+    if not ok:
+        print(f"[DEBUG] {backend} embeddings differ from eager by {max_distance:.2e}, using eager.")
+        return eager
+    print(f"[DEBUG] Using {backend} embedder (parity {max_distance:.2e}).")
+    return compiled
+
+
+def list_images(directory):
+    """All image files below directory, sorted."""
+    return sorted(path for path in glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+                  if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def load_face_crops(paths):
+    """
+    Detect the largest face in each image and return the crops with their file stems.
+
+    Returns:
+        tuple: (Nx3x160x160 tensor or None, list of labels)
+    """
+    import cv2
+    from face_models import crop_faces, detect_faces
+
+    crops, labels = [], []
+    for path in paths:
+        image = cv2.imread(path)
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image is not None else None
+        boxes = detect_faces(image)[0] if image is not None else None
+        if boxes is None:
+            print(f"No face in {path}, skipped.")
+            continue
+        crops.append(crop_faces(image, boxes[:1]))
+        labels.append(os.path.splitext(os.path.basename(path))[0])
+    return (torch.cat(crops) if crops else None), labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export, quantize and check the face embedding backends.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("check", help="export a backend and compare it with the eager model")
+    check.add_argument("backend", choices=BACKENDS[1:])
+    check.add_argument("images", nargs="*", help="face images to compare on (random input if omitted)")
+    calibrate = commands.add_parser("calibrate", help="build the int8 model from enrolment photos")
+    calibrate.add_argument("directory")
+    evaluate = commands.add_parser("evaluate", help="compare int8 against float32 on a folder of photos")
+    evaluate.add_argument("directory")
+    evaluate.add_argument("--db", default=None, help="database with the reference gallery")
+    args = parser.parse_args(argv)
+
+    from face_models import device, load_eager_resnet
+    eager = load_eager_resnet()
+
+    if args.command == "check":
+        faces, _ = load_face_crops(args.images)
+        compiled = _export(args.backend, eager, device)
+        tolerance = INT8_TOLERANCE if args.backend == "int8" else PARITY_TOLERANCE
+        ok, max_distance = check_parity(eager, compiled, faces, tolerance)
+        print(f"{args.backend}: max cosine distance to eager = {max_distance:.2e} "
+              f"({'OK' if ok else 'FAIL'}, tolerance {tolerance:.0e})")
+        return 0 if ok else 1
+
+    faces, labels = load_face_crops(list_images(args.directory))
+    if faces is None:
+        print(f"No usable face images in {args.directory}.")
+        return 1
+
+    if args.command == "calibrate":
+        quantize_int8(eager.cpu(), faces)
+        return 0
+
+    report = evaluate_int8(eager.cpu(), load_int8(eager, torch.device("cpu")), faces, labels, args.db)
+    for key, value in report.items():
+        print(f"{key:>28}: {value:.4f}" if isinstance(value, float) else f"{key:>28}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import hashlib
+import os
+
+import numpy as np
+
+ANN_MIN_GALLERY = 10000  # Below this many faces an exact scan is fast enough
+IVF_NPROBE = 8  # Lists searched per query: higher = better recall, slower
+IVF_LISTS_PER_SQRT = 4  # nlist = IVF_LISTS_PER_SQRT * sqrt(gallery size)
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLES_PER_LIST = 64
+IVF_RETRAIN_GROWTH = 2.0  # Retrain the centroids once the gallery doubles since training
+
+
+def index_path_for(db_path, mode="max"):
+    """Index file stored next to the database, e.g. attendance_system.max.index.npz."""
+    return f"{os.path.splitext(db_path)[0]}.{mode}.index.npz"
+
+
+def gallery_checksum(keys, matrix):
+    """Fingerprint of the gallery rows (keys and vectors) an index was saved for."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\n".join(keys).encode())
+    digest.update(np.ascontiguousarray(matrix).data)
+    return digest.hexdigest()
+
+
+def top_k(similarities, k):
+    """Column indices of the k largest values per row, best first."""
+    k = min(k, similarities.shape[1])
+    if k == 1:
+        return np.argmax(similarities, axis=1)[:, None]
+    indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(similarities, indices, axis=1), axis=1)
+    return np.take_along_axis(indices, order, axis=1)
+
+
+class BruteForceIndex:
+    """Exact search: one matrix product against every gallery row."""
+
+    def search(self, matrix, queries, k=1):
+        """
+        Args:
+            matrix (np.ndarray): Normalized gallery rows.
+            queries (np.ndarray): Normalized QxD queries.
+
+        Returns:
+            tuple: (rows, similarities), both Qxk, best first.
+        """
+        similarities = queries @ matrix.T
+        rows = top_k(similarities, k)
+        return rows, np.take_along_axis(similarities, rows, axis=1)
+
+    def add(self, vectors):
+        return self
+
+    def remove(self, keep):
+        return self
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the gallery matrix, implemented in NumPy.
+
+    Rows are assigned to the nearest of nlist k-means centroids; a query only
+    scans the rows of its nprobe nearest lists, exactly. The index holds one
+    list number per gallery row (aligned with the matrix), so it follows the
+    gallery's additions and deletions without retraining. Like the gallery arrays,
+    every change returns a new index so readers never see a half-updated one.
+    """
+
+    def __init__(self, centroids, assignment, nprobe=IVF_NPROBE, trained_size=None):
+        self.centroids = centroids
+        self.assignment = assignment
+        self.nprobe = nprobe
+        self.trained_size = trained_size or len(assignment)
+        self._lists = None
+
+    @classmethod
+    def train(cls, matrix, nlist=None, nprobe=IVF_NPROBE, seed=0):
+        """Spherical k-means on a sample of the gallery, then assign every row."""
+        rng = np.random.default_rng(seed)
+        nlist = nlist or max(1, int(IVF_LISTS_PER_SQRT * np.sqrt(len(matrix))))
+        nlist = min(nlist, len(matrix))
+        sample_size = min(len(matrix), nlist * IVF_TRAIN_SAMPLES_PER_LIST)
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for j in range(nlist):
+                members = sample[labels == j]
+                # Re-seed empty lists with a random sample row
+                centroid = members.sum(axis=0) if len(members) else sample[rng.integers(len(sample))]
+                centroids[j] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        return cls(centroids, cls.assign(centroids, matrix), nprobe, len(matrix))
+
+    @staticmethod
+    def assign(centroids, vectors):
+        if len(vectors) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignment, kind="stable")
+            bounds = np.searchsorted(self.assignment[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, bounds)
+        return self._lists
+
+    def search(self, matrix, queries, k=1, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        order, bounds = self._inverted_lists()
+        probes = top_k(queries @ self.centroids.T, nprobe)
+
+        rows = np.zeros((len(queries), k), dtype=np.int64)
+        similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([order[bounds[j]:bounds[j + 1]] for j in lists])
+            if not len(candidates):
+                continue
+            scores = matrix[candidates] @ queries[q]
+            best = top_k(scores[None, :], k)[0]
+            rows[q, :len(best)] = candidates[best]
+            similarities[q, :len(best)] = scores[best]
+        return rows, similarities
+
+    def _with_assignment(self, assignment):
+        return IVFIndex(self.centroids, assignment, self.nprobe, self.trained_size)
+
+    def add(self, vectors):
+        """Index new rows appended to the gallery matrix (one vector or a batch)."""
+        vectors = vectors.reshape(-1, self.centroids.shape[1])
+        return self._with_assignment(np.append(self.assignment, self.assign(self.centroids, vectors)))
+
+    def remove(self, keep):
+        return self._with_assignment(self.assignment[keep])
+
+    def needs_retraining(self, size):
+        return size > IVF_RETRAIN_GROWTH * self.trained_size
+
+    def save(self, path, keys, matrix):
+        """Persist centroids and the list assignment of each row, by row key."""
+        np.savez(path, centroids=self.centroids, assignment=self.assignment,
+                 keys=np.array(keys, dtype=str), trained_size=self.trained_size,
+                 checksum=gallery_checksum(keys, matrix))
+
+    @classmethod
+    def load(cls, path, keys, matrix, nprobe=IVF_NPROBE):
+        """
+        Load a saved index for the current gallery. The saved list assignment is
+        reused only if the gallery is the one it was saved for, by checksum;
+        otherwise (samples added, replaced or deleted, also by another process
+        such as enroll.py) every row is reassigned to the saved centroids.
+        Returns None if the file is missing or does not fit the gallery.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            data = np.load(path)
+            centroids = data["centroids"]
+            assignment = data["assignment"].astype(np.int32)
+            trained_size = int(data["trained_size"])
+            checksum = str(data["checksum"]) if "checksum" in data.files else None
+        except Exception as e:
+            print(f"[DEBUG] Ignoring unreadable face index {path}: {e}")
+            return None
+        if centroids.shape[1] != matrix.shape[1]:
+            return None
+
+        if checksum != gallery_checksum(keys, matrix):
+            print(f"[DEBUG] Face index {path} does not match the gallery; reassigning every row")
+            assignment = cls.assign(centroids, matrix)
+        return cls(centroids, assignment, nprobe, trained_size)
+
+
+def build_index(keys, matrix, path=None, nprobe=IVF_NPROBE):
+    """
+    Pick the index for a gallery: exact below ANN_MIN_GALLERY rows, IVF above.
+
+    keys identify the gallery rows in the persisted file. The IVF index is
+    reused from path when possible and (re)trained otherwise.
+    """
+    if len(matrix) < ANN_MIN_GALLERY:
+        return BruteForceIndex()
+
+    index = IVFIndex.load(path, keys, matrix, nprobe) if path else None
+    if index is None or index.needs_retraining(len(matrix)):
+        index = IVFIndex.train(matrix, nprobe=nprobe)
+        print(f"[DEBUG] Trained face index with {len(index.centroids)} lists on {len(matrix)} faces")
+    if path:
+        index.save(path, keys, matrix)
+    return index
@@ -1,13 +1,276 @@
+import copy
+import math
+import os
+import threading
+import time
+import cv2
+import numpy as np
 import torch
-from facenet_pytorch import MTCNN, InceptionResnetV1
+from facenet_pytorch import MTCNN, InceptionResnetV1, extract_face, fixed_image_standardization
 
 # Set device
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Load MTCNN and ResNet models
-mtcnn = MTCNN(image_size=160, margin=0, min_face_size=20,
-              thresholds=[0.6, 0.7, 0.7], factor=0.709, post_process=True, device=device)
-resnet = InceptionResnetV1(pretrained="vggface2").eval().to(device)
+# Inference backend: "eager" PyTorch, a compiled "torchscript" / "onnx" export or an
+# "int8" quantized embedder (see face_backends)
+FACE_BACKEND = os.environ.get("FACE_BACKEND", "eager")
+
+# Models are built on first use (or by preload_models) and shared process-wide
+_mtcnn = None
+_mtcnn_variants = {}  # min_face_size -> MTCNN sharing the base instance's networks
+_resnet = None
+_mtcnn_lock = threading.Lock()
+_resnet_lock = threading.Lock()  # Separate locks: detection need not wait for the ResNet download
+
+
+def get_mtcnn(min_face_size=None):
+    """
+    Return the shared MTCNN detector, loading it on first use.
+
+    Args:
+        min_face_size (int): Optional min_face_size for this caller. Variants share
+            the P/R/O networks of the base detector, so no weights are loaded twice.
+    """
+    global _mtcnn
+    if min_face_size is None and _mtcnn is not None:
+        return _mtcnn
+    with _mtcnn_lock:
+        if _mtcnn is None:
+            start = time.perf_counter()
+            _mtcnn = MTCNN(image_size=160, margin=0, min_face_size=20,
+                           thresholds=[0.6, 0.7, 0.7], factor=0.709, post_process=True, device=device)
+            if FACE_BACKEND != "eager":
+                from face_backends import compile_detector
+                try:
+                    compile_detector(_mtcnn, device)
+                except Exception as e:
+                    print(f"[DEBUG] Could not compile MTCNN nets ({e}), using eager.")
+            print(f"[STARTUP] MTCNN loaded in {time.perf_counter() - start:.2f}s")
+        if min_face_size is None or min_face_size == _mtcnn.min_face_size:
+            return _mtcnn
+        if min_face_size not in _mtcnn_variants:
+            variant = copy.copy(_mtcnn)
+            variant.min_face_size = min_face_size
+            _mtcnn_variants[min_face_size] = variant
+        return _mtcnn_variants[min_face_size]
+
+
+def load_eager_resnet():
+    """Build a fresh eager-mode InceptionResnetV1 with VGGFace2 weights."""
+    return InceptionResnetV1(pretrained="vggface2").eval().to(device)
+
+
+def get_resnet():
+    """
+    Return the shared embedding network, loading it on first use.
+
+    With FACE_BACKEND set to a compiled backend this is the exported model
+    (which has passed a parity check against the eager one), else plain PyTorch.
+    """
+    global _resnet
+    if _resnet is not None:
+        return _resnet
+    with _resnet_lock:
+        if _resnet is None:
+            start = time.perf_counter()
+            _resnet = load_eager_resnet()
+            if FACE_BACKEND != "eager":
+                from face_backends import load_embedder
+                _resnet = load_embedder(FACE_BACKEND, _resnet, device)
+            print(f"[STARTUP] InceptionResnetV1 loaded in {time.perf_counter() - start:.2f}s")
+        return _resnet
+
+
+def preload_models(background=True):
+    """
+    Load both models ahead of first use.
+
+    Args:
+        background (bool): Load in a daemon thread so the caller (e.g. the GUI) is not blocked.
+
+    Returns:
+        threading.Thread or None: The loader thread when background is True.
+    """
+    def load():
+        start = time.perf_counter()
+        get_mtcnn()
+        get_resnet()
+        print(f"[STARTUP] Models ready after {time.perf_counter() - start:.2f}s")
+
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # Keep face_models.mtcnn / face_models.resnet working without eager loading
+    if name == "mtcnn":
+        return get_mtcnn()
+    if name == "resnet":
+        return get_resnet()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Live camera detection runs on a downscaled copy of the frame. The scale and MTCNN's
+# min_face_size are derived from how large a face is expected to appear at the door:
+# a FACE_HEIGHT_M tall face at DOOR_DISTANCE_M through a lens with CAMERA_HFOV_DEG.
+DOOR_DISTANCE_M = 1.5
+CAMERA_HFOV_DEG = 70.0
+FACE_HEIGHT_M = 0.24
+EXPECTED_FACE_SIZE = None  # Face height in full-frame pixels; overrides the derivation above
+DETECTION_FACE_SIZE = 80  # Pixel height expected faces are scaled to for detection
+MIN_FACE_RATIO = 0.5  # Smallest detectable face, relative to the expected face size
+DETECTION_SCALE = None  # Fixed detection scale; overrides the derived one
+
+
+def detect_faces(image_rgb):
+    """
+    Detect every face in an RGB image.
+
+    Args:
+        image_rgb (np.ndarray): Input RGB image.
+
+    Returns:
+        tuple: (boxes, probs, landmarks) with boxes as an Nx4 array sorted largest first,
+        or (None, None, None) if no face is detected.
+    """
+    boxes, probs, landmarks = get_mtcnn().detect(image_rgb, landmarks=True)
+    if boxes is None:
+        return None, None, None
+    return boxes, probs, landmarks
+
+
+def detection_settings(frame_width):
+    """
+    Work out the detection scale and MTCNN min_face_size for frames of a given width.
+
+    Args:
+        frame_width (int): Width of the full-resolution camera frame in pixels.
+
+    Returns:
+        tuple: (scale, min_face_size) where scale <= 1 is applied to the frame before
+        detection and min_face_size is in pixels of the downscaled frame.
+    """
+    if EXPECTED_FACE_SIZE:
+        face_px = EXPECTED_FACE_SIZE
+    else:
+        focal_px = (frame_width / 2) / math.tan(math.radians(CAMERA_HFOV_DEG) / 2)
+        face_px = focal_px * FACE_HEIGHT_M / DOOR_DISTANCE_M
+
+    scale = DETECTION_SCALE or min(1.0, DETECTION_FACE_SIZE / face_px)
+    min_face_size = max(12, int(face_px * scale * MIN_FACE_RATIO))
+    return scale, min_face_size
+
+
+def detect_faces_scaled(image_rgb, scale, detector=None):
+    """
+    Detect faces on a downscaled copy of image_rgb and map the results back.
+
+    Only detection sees the small copy; boxes and landmarks are returned in
+    full-resolution coordinates so crops can be cut from the original frame.
+
+    Args:
+        image_rgb (np.ndarray): Full-resolution RGB image.
+        scale (float): Resize factor for detection (1.0 = no resize).
+        detector (MTCNN): Detector to use, defaults to the shared one.
+
+    Returns:
+        tuple: (boxes, probs, landmarks) as in detect_faces.
+    """
+    detector = detector or get_mtcnn()
+    if scale < 1.0:
+        height, width = image_rgb.shape[:2]
+        small = cv2.resize(image_rgb, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small, scale = image_rgb, 1.0
+
+    boxes, probs, landmarks = detector.detect(small, landmarks=True)
+    if boxes is None:
+        return None, None, None
+    boxes = np.asarray(boxes, dtype=np.float32) / scale
+    if landmarks is not None:
+        landmarks = np.asarray(landmarks, dtype=np.float32) / scale
+    return boxes, probs, landmarks
+
+
+def crop_faces(image_rgb, boxes):
+    """
+    Cut the faces given by boxes out of an RGB image, exactly as mtcnn(image) would.
+
+    Args:
+        image_rgb (np.ndarray): Input RGB image.
+        boxes (array-like): Nx4 boxes [x1, y1, x2, y2] in image coordinates.
+
+    Returns:
+        torch.Tensor: Nx3x160x160 batch of standardized face crops.
+    """
+    detector = get_mtcnn()
+    faces = [
+        fixed_image_standardization(extract_face(image_rgb, box, detector.image_size, detector.margin))
+        for box in boxes
+    ]
+    return torch.stack(faces)
+
+
+def embed_faces(faces):
+    """
+    Run cropped faces through the embedding network.
+
+    Args:
+        faces (torch.Tensor): A 3x160x160 face or an Nx3x160x160 batch.
+
+    Returns:
+        torch.Tensor: A 512-d embedding, or an Nx512 batch of embeddings.
+    """
+    single = faces.dim() == 3
+    if single:
+        faces = faces.unsqueeze(0)
+
+    with torch.no_grad():
+        embeddings = get_resnet()(faces.to(device))
+
+    return embeddings.squeeze(0) if single else embeddings
+
+
+def extract_embeddings_from_boxes(image_rgb, boxes):
+    """
+    Embed faces at already known positions, skipping detection.
+
+    Used with detections published by the camera so that MTCNN runs only once per frame.
+
+    Args:
+        image_rgb (np.ndarray): Input RGB image the boxes were detected on.
+        boxes (array-like): Nx4 boxes [x1, y1, x2, y2].
+
+    Returns:
+        torch.Tensor or None: Nx512 embeddings, or None if boxes is empty.
+    """
+    if boxes is None or len(boxes) == 0:
+        return None
+    return embed_faces(crop_faces(image_rgb, boxes))
+
+
+def extract_embeddings(image_rgb, max_faces=None):
+    """
+    Extract embeddings for all faces in an RGB image with one batched forward pass.
+
+    Args:
+        image_rgb (np.ndarray): Input RGB image.
+        max_faces (int): Optional cap on the number of faces, largest first.
+
+    Returns:
+        tuple: (embeddings, boxes) as an Nx512 tensor and Nx4 array,
+        or (None, None) if no face is detected.
+    """
+    boxes, _, _ = detect_faces(image_rgb)
+    if boxes is None:
+        return None, None
+    if max_faces:
+        boxes = boxes[:max_faces]
+    return extract_embeddings_from_boxes(image_rgb, boxes), boxes
 
 
 def extract_embedding(image_rgb):
@@ -22,15 +285,13 @@ def extract_embedding(image_rgb):
     """
     #print("[DEBUG] extract_embedding called with:", type(image_rgb))
 
-    # Detect face
-    face = mtcnn(image_rgb)
-    if face is None:
+    # Detect face and keep the largest one
+    boxes, _, _ = detect_faces(image_rgb)
+    if boxes is None:
         print("No face detected.")
         return None
 
-    face = face.to(device)
-    with torch.no_grad():
-        embedding = resnet(face.unsqueeze(0)).squeeze(0)
+    embedding = extract_embeddings_from_boxes(image_rgb, boxes[:1])[0]
 
     #print("[DEBUG] embedding shape:", embedding.shape)
     return embedding
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+IOU_THRESHOLD = 0.3  # Minimum overlap to continue a track
+CENTROID_RATIO = 0.5  # Fallback: centre shift allowed, as a fraction of the box diagonal
+MAX_MISSES = 10  # Detection passes a track may go unseen before it is dropped
+REFRESH_INTERVAL = 3.0  # Seconds between re-checks of a confidently identified track
+RETRY_INTERVAL = 0.5  # Seconds between re-checks of an unknown or low-confidence track
+VOTE_WINDOW = 5  # Recent match results a track's identity is voted from
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise intersection-over-union of two Nx4 / Mx4 box arrays."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class FaceTrack:
+    """One face followed across frames, with the identity it was last matched to."""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.created_at = now
+        self.misses = 0
+        self.name = None
+        self.distance = None
+        self.last_check = None  # When an embedding was last requested for this track
+        self.votes = deque(maxlen=VOTE_WINDOW)
+
+    def needs_check(self, now, threshold):
+        if self.last_check is None:
+            return True
+        confident = self.name is not None and self.distance is not None and self.distance < threshold
+        interval = REFRESH_INTERVAL if confident else RETRY_INTERVAL
+        return now - self.last_check >= interval
+
+    def observe(self, name, distance):
+        """Fold in a new match result; the identity is the majority of recent votes."""
+        self.votes.append(name)
+        # Ties go to the older vote, so a single outlier cannot flip an identity
+        self.name = Counter(self.votes).most_common(1)[0][0]
+        if name == self.name:
+            self.distance = distance
+
+
+class FaceTracker:
+    """
+    Associates detections between frames so each face is embedded once per track
+    instead of once per frame.
+
+    update() is called with every new set of detections and returns, for each box,
+    the track it belongs to and whether it should be (re-)embedded. observe() feeds
+    match results back; tracks keep their identity between re-checks.
+    """
+
+    def __init__(self, threshold=0.3):
+        self.threshold = threshold  # Distance below which a track counts as confidently identified
+        self.tracks = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def update(self, boxes, now=None):
+        """
+        Args:
+            boxes (array-like): Nx4 detections of the current frame (may be empty or None).
+
+        Returns:
+            tuple: (track_ids, to_embed) where track_ids[i] is the track of boxes[i] and
+            to_embed lists the indices of boxes that need a fresh embedding.
+        """
+        now = time.time() if now is None else now
+        boxes = np.zeros((0, 4), dtype=np.float32) if boxes is None else np.asarray(boxes, dtype=np.float32)
+
+        with self._lock:
+            track_ids = list(self.tracks)
+            assignment = self._associate([self.tracks[t].box for t in track_ids], boxes)
+
+            result_ids, to_embed = [], []
+            seen = set()
+            for i, box in enumerate(boxes):
+                j = assignment.get(i)
+                if j is None:
+                    track = FaceTrack(self._next_id, box, now)
+                    self.tracks[track.track_id] = track
+                    self._next_id += 1
+                else:
+                    track = self.tracks[track_ids[j]]
+                    track.box = box
+                    track.misses = 0
+                seen.add(track.track_id)
+                result_ids.append(track.track_id)
+
+                if track.needs_check(now, self.threshold):
+                    track.last_check = now
+                    to_embed.append(i)
+
+            for track_id in track_ids:
+                if track_id not in seen:
+                    self.tracks[track_id].misses += 1
+                    if self.tracks[track_id].misses > MAX_MISSES:
+                        del self.tracks[track_id]
+
+        return result_ids, to_embed
+
+    def observe(self, track_id, name, distance):
+        """Record a match result for a track (ignored if the track has since expired)."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is not None:
+                track.observe(name if distance < self.threshold else None, distance)
+
+    def identity(self, track_id):
+        """Current (name, distance) of a track, or (None, None)."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            return (track.name, track.distance) if track is not None else (None, None)
+
+    def reset(self):
+        with self._lock:
+            self.tracks.clear()
+
+    @staticmethod
+    def _associate(track_boxes, boxes):
+        """Greedy matching: highest IoU first, then nearest centroid for what is left."""
+        assignment = {}
+        if not len(track_boxes) or not len(boxes):
+            return assignment
+        track_boxes = np.asarray(track_boxes, dtype=np.float32)
+
+        ious = iou_matrix(boxes, track_boxes)
+        used = set()
+        for flat in np.argsort(-ious, axis=None):
+            i, j = (int(v) for v in np.unravel_index(flat, ious.shape))
+            if ious[i, j] < IOU_THRESHOLD:
+                break
+            if i in assignment or j in used:
+                continue
+            assignment[i] = j
+            used.add(j)
+
+        centres = (boxes[:, :2] + boxes[:, 2:]) / 2
+        track_centres = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        for i in range(len(boxes)):
+            if i in assignment:
+                continue
+            diagonal = np.linalg.norm(boxes[i, 2:] - boxes[i, :2])
+            shifts = np.linalg.norm(track_centres - centres[i], axis=1)
+            for j in (int(v) for v in np.argsort(shifts)):
+                if shifts[j] > CENTROID_RATIO * diagonal:
+                    break
+                if j not in used:
+                    assignment[i] = j
+                    used.add(j)
+                    break
+        return assignment
@@ -0,0 +1,107 @@
+import math
+import time
+
+import cv2
+import numpy as np
+
+PREVIEW_FPS = 30  # Upper bound for the preview rate; real cameras usually pace themselves
+DETECTION_CPU_BUDGET = 0.5  # Fraction of wall time the capture thread may spend in MTCNN
+TARGET_DETECTION_FPS = None  # Optional hard cap on detections per second
+MIN_DETECTION_INTERVAL = 1  # Frames between detections, lower and upper bound
+MAX_DETECTION_INTERVAL = 15  # A detection is forced at least this often, motion or not
+MOTION_SIZE = (64, 48)  # Resolution the motion detector works at
+MOTION_PIXEL_DELTA = 25  # Grey-level change that counts a pixel as moving
+MOTION_RATIO = 0.01  # Fraction of moving pixels that counts as motion
+EMA_ALPHA = 0.2  # Smoothing of the measured stage costs
+
+
+class MotionDetector:
+    """Cheap frame-difference motion detector on a tiny greyscale thumbnail."""
+
+    def __init__(self, size=MOTION_SIZE, pixel_delta=MOTION_PIXEL_DELTA, ratio=MOTION_RATIO):
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self.ratio = ratio
+        self._previous = None
+
+    def update(self, frame_bgr):
+        """Return True if frame_bgr differs noticeably from the previous frame."""
+        small = cv2.resize(frame_bgr, self.size, interpolation=cv2.INTER_AREA)
+        grey = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self._previous = self._previous, grey
+        if previous is None:
+            return True
+        moving = np.count_nonzero(cv2.absdiff(grey, previous) > self.pixel_delta)
+        return moving >= self.ratio * grey.size
+
+
+class DetectionScheduler:
+    """
+    Decides on which camera frames face detection runs.
+
+    Every frame is shown in the preview, but MTCNN only runs every `interval`
+    frames, where the interval adapts so that detection stays within
+    cpu_budget (and target_fps, if set) given its measured cost and the
+    measured camera rate. Between those points detection is skipped entirely
+    while nothing moves and no face was seen, and it is forced every
+    max_interval frames so a still scene is still refreshed.
+    """
+
+    def __init__(self, cpu_budget=DETECTION_CPU_BUDGET, target_fps=TARGET_DETECTION_FPS,
+                 min_interval=MIN_DETECTION_INTERVAL, max_interval=MAX_DETECTION_INTERVAL,
+                 motion_detector=None):
+        self.cpu_budget = cpu_budget
+        self.target_fps = target_fps
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion = motion_detector or MotionDetector()
+
+        self.interval = min_interval
+        self.frames_since_detection = max_interval  # Detect on the very first frame
+        self.faces_present = False
+        self.costs = {}  # Stage name -> smoothed seconds per call
+        self._last_frame_time = None
+        self.frame_period = 1 / PREVIEW_FPS
+
+    def record(self, stage, seconds):
+        """Fold a measured stage duration into its moving average."""
+        previous = self.costs.get(stage)
+        self.costs[stage] = seconds if previous is None else (1 - EMA_ALPHA) * previous + EMA_ALPHA * seconds
+
+    def should_detect(self, frame_bgr):
+        """Call once per captured frame; returns True if detection should run on it."""
+        now = time.perf_counter()
+        if self._last_frame_time is not None:
+            period = now - self._last_frame_time
+            self.frame_period = (1 - EMA_ALPHA) * self.frame_period + EMA_ALPHA * period
+        self._last_frame_time = now
+
+        self.frames_since_detection += 1
+        start = time.perf_counter()
+        moving = self.motion.update(frame_bgr)
+        self.record("motion", time.perf_counter() - start)
+
+        if self.frames_since_detection >= self.max_interval:
+            return True
+        if self.frames_since_detection < self.interval:
+            return False
+        return moving or self.faces_present
+
+    def detection_done(self, seconds, num_faces):
+        """Report the cost and outcome of a detection and adapt the interval."""
+        self.frames_since_detection = 0
+        self.faces_present = num_faces > 0
+        self.record("detect", seconds)
+
+        camera_fps = 1 / max(self.frame_period, 1e-3)
+        interval = self.costs["detect"] * camera_fps / max(self.cpu_budget, 1e-3)
+        if self.target_fps:
+            interval = max(interval, camera_fps / self.target_fps)
+        self.interval = int(min(max(math.ceil(interval), self.min_interval), self.max_interval))
+
+    def stats(self):
+        """Smoothed per-stage costs in ms plus the current camera rate and detection interval."""
+        stats = {f"{stage}_ms": 1000 * cost for stage, cost in self.costs.items()}
+        stats["camera_fps"] = 1 / max(self.frame_period, 1e-3)
+        stats["detection_interval"] = self.interval
+        return stats
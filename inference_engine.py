@@ -0,0 +1,267 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Worker processes used for detection/embedding; 0 keeps inference in-process
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", min(4, (os.cpu_count() or 1) // 4)))
+MAX_FRAME_BYTES = 1920 * 1080 * 3  # Largest frame a shared-memory slot can hold
+SLOTS_PER_WORKER = 2  # Frames that may be in flight per worker
+MAX_WORKER_RESTARTS = 5  # Dead workers respawned per engine; beyond this their share runs in-process
+
+
+def _infer(buffer, shape, boxes):
+    """Detect (if needed) and embed the faces of the frame stored in buffer."""
+    from face_models import detect_faces, extract_embeddings_from_boxes
+
+    rgb = np.ndarray(shape, dtype=np.uint8, buffer=buffer)[..., ::-1]
+    if boxes is None:
+        boxes, _, _ = detect_faces(rgb)
+    if boxes is None or not len(boxes):
+        return None, None
+    return boxes, extract_embeddings_from_boxes(rgb, boxes).cpu().numpy()
+
+
+def _worker_main(slot_names, tasks, results, torch_threads):
+    """
+    Worker process: owns its own MTCNN/InceptionResnetV1 and serves
+    (task_id, slot, shape, boxes) requests.
+    """
+    import torch
+    torch.set_num_threads(torch_threads)
+    from face_models import preload_models
+    preload_models(background=False)  # Load the models before the first task arrives
+
+    # Spawned workers share the parent's resource tracker, so attaching does not
+    # transfer ownership: only the engine that created the blocks unlinks them
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, slot, shape, boxes = task
+            try:
+                boxes, embeddings = _infer(slots[slot].buf, shape, boxes)
+                results.put((task_id, slot, boxes, embeddings, None))
+            except Exception as e:
+                results.put((task_id, slot, None, None, repr(e)))
+    finally:
+        for shm in slots:
+            shm.close()
+
+
+class InferenceEngine:
+    """
+    Pool of worker processes that run detection and embedding outside the GIL.
+
+    Frames are copied once into a ring of shared-memory slots instead of being
+    pickled; only the slot index, shape and boxes cross the process boundary.
+    submit() returns a Future that resolves to (boxes, embeddings), and futures
+    complete strictly in submission order. Every worker has its own task queue,
+    so when one dies only the tasks it held fail; their slots are reclaimed and
+    the worker is respawned. Frames larger than a slot, and every frame once no
+    worker is left, are inferred in the calling thread instead. shutdown() stops
+    the workers and frees the shared memory.
+    """
+
+    def __init__(self, num_workers=INFERENCE_WORKERS, max_frame_bytes=MAX_FRAME_BYTES,
+                 slots_per_worker=SLOTS_PER_WORKER):
+        self.num_workers = max(1, num_workers)
+        self.max_frame_bytes = max_frame_bytes
+        self._ctx = mp.get_context("spawn")  # fork is unsafe with torch/Qt state in the parent
+
+        self._slots = [shared_memory.SharedMemory(create=True, size=max_frame_bytes)
+                       for _ in range(self.num_workers * slots_per_worker)]
+        self._free_slots = queue.Queue()
+        for i in range(len(self._slots)):
+            self._free_slots.put(i)
+
+        self._results = self._ctx.Queue()
+        self._torch_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        self._workers = [None] * self.num_workers  # None once a worker is given up on
+        self._task_queues = [None] * self.num_workers
+        self._restarts = 0
+        for index in range(self.num_workers):
+            self._spawn(index)
+
+        self._lock = threading.Lock()
+        self._next_task = 0
+        self._next_delivery = 0
+        self._pending = {}  # task_id -> Future
+        self._finished = {}  # task_id -> (result, error) waiting for earlier tasks
+        self._assigned = {}  # task_id -> (worker index, slot) of tasks sent to a worker
+        self._oversized = False
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, name="inference-collector", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, index):
+        self._task_queues[index] = self._ctx.Queue()
+        worker = self._ctx.Process(
+            target=_worker_main,
+            args=([shm.name for shm in self._slots], self._task_queues[index], self._results, self._torch_threads),
+            daemon=True, name=f"inference-{index}")
+        worker.start()
+        self._workers[index] = worker
+
+    def submit(self, frame_bgr, boxes=None, timeout=None):
+        """
+        Queue a frame for detection (if boxes is None) and embedding.
+
+        Blocks while every shared-memory slot is in use, for at most timeout
+        seconds (queue.Empty is raised then).
+
+        Args:
+            frame_bgr (np.ndarray): HxWx3 uint8 BGR frame.
+            boxes (np.ndarray): Optional Nx4 boxes already detected on the frame.
+
+        Returns:
+            Future: resolves to (boxes, embeddings) with embeddings as an Nx512
+            ndarray, or (None, None) if no face was found.
+        """
+        if self._closed:
+            raise RuntimeError("InferenceEngine has been shut down")
+        frame_bgr = np.ascontiguousarray(frame_bgr, dtype=np.uint8)
+        if boxes is not None:
+            boxes = np.asarray(boxes, dtype=np.float32)
+
+        slot = None
+        if frame_bgr.nbytes <= self.max_frame_bytes and any(self._workers):
+            slot = self._free_slots.get(timeout=timeout)
+            target = np.ndarray(frame_bgr.shape, dtype=np.uint8, buffer=self._slots[slot].buf)
+            target[...] = frame_bgr
+            del target
+        elif frame_bgr.nbytes > self.max_frame_bytes and not self._oversized:
+            self._oversized = True
+            print(f"[DEBUG] Frames of {frame_bgr.nbytes} bytes exceed MAX_FRAME_BYTES; inferring them in-process")
+
+        future = Future()
+        with self._lock:
+            task_id = self._next_task
+            self._next_task += 1
+            self._pending[task_id] = future
+            live = [index for index, worker in enumerate(self._workers) if worker is not None]
+            if slot is not None and live:
+                # Least busy worker; queued under the lock so a dying worker's tasks are all known
+                loads = {index: 0 for index in live}
+                for owner, _ in self._assigned.values():
+                    loads[owner] = loads.get(owner, 0) + 1
+                worker = min(live, key=loads.get)
+                self._assigned[task_id] = (worker, slot)
+                self._task_queues[worker].put((task_id, slot, frame_bgr.shape, boxes))
+                return future
+
+        if slot is not None:
+            self._free_slots.put(slot)  # The last worker was given up on meanwhile
+        try:
+            result, error = _infer(frame_bgr, frame_bgr.shape, boxes), None
+        except Exception as e:
+            result, error = (None, None), repr(e)
+        self._finish(task_id, result, error)
+        return future
+
+    def _collect(self):
+        while True:
+            self._check_workers()
+            try:
+                item = self._results.get(timeout=0.5)
+            except queue.Empty:
+                if self._closed:
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+
+            task_id, slot, boxes, embeddings, error = item
+            with self._lock:
+                if self._assigned.pop(task_id, None) is None:
+                    continue  # Failed already: its worker was found dead before the result arrived
+            self._free_slots.put(slot)
+            self._finish(task_id, (boxes, embeddings), error)
+
+    def _finish(self, task_id, result, error):
+        with self._lock:
+            self._finished[task_id] = (result, error)
+            self._deliver()
+
+    def _deliver(self):
+        """Resolve finished futures in submission order; the caller holds _lock."""
+        while self._next_delivery in self._finished:
+            result, error = self._finished.pop(self._next_delivery)
+            future = self._pending.pop(self._next_delivery, None)
+            self._next_delivery += 1
+            if future is None or future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(error))
+
+    def _check_workers(self):
+        for index, worker in enumerate(self._workers):
+            if worker is not None and not worker.is_alive() and not self._closed:
+                self._recover(index, worker.exitcode)
+
+    def _recover(self, index, exitcode):
+        """Fail the tasks a dead worker held, reclaim their slots and respawn it."""
+        with self._lock:
+            lost = [task_id for task_id, (owner, _) in self._assigned.items() if owner == index]
+            slots = [self._assigned.pop(task_id)[1] for task_id in lost]
+            for task_id in lost:
+                self._finished[task_id] = ((None, None), f"Inference worker {index} died (exit code {exitcode})")
+            self._deliver()
+
+            # Tasks still queued for it were among the lost ones; the queue goes with the worker
+            self._task_queues[index].close()
+            self._task_queues[index].cancel_join_thread()
+            if self._closed or self._restarts >= MAX_WORKER_RESTARTS:
+                self._workers[index] = None
+                self._task_queues[index] = None
+            else:
+                self._restarts += 1
+                self._spawn(index)
+        for slot in slots:
+            self._free_slots.put(slot)
+        print(f"[DEBUG] Inference worker {index} died (exit code {exitcode}), {len(lost)} tasks failed, "
+              + ("respawned" if self._workers[index] is not None else "not respawned"))
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError(reason))
+            self._pending.clear()
+            self._finished.clear()
+            self._assigned.clear()
+
+    def shutdown(self, timeout=5):
+        """Stop the workers, fail outstanding futures and release shared memory."""
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+            workers = [(worker, tasks) for worker, tasks in zip(self._workers, self._task_queues)
+                       if worker is not None]
+        for _, tasks in workers:
+            tasks.put(None)
+        for worker, _ in workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join(1)
+
+        self._results.put(None)
+        self._collector.join(timeout)
+        self._fail_pending("InferenceEngine shut down")
+
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        print("[DEBUG] Inference engine stopped.")
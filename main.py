@@ -1,9 +1,33 @@
 import sys
+import time
+
+startup = time.perf_counter()
+
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 from main_window import MainWindow
+from face_models import preload_models
+
+
+def report_startup(stage, since):
+    """Print how long a startup stage took and return the time it ended."""
+    now = time.perf_counter()
+    print(f"[STARTUP] {stage}: {now - since:.2f}s")
+    return now
+
+
+def on_window_shown(since):
+    report_startup("first paint", since)
+    # Face models load in the background; the window is usable in the meantime
+    preload_models()
+
 
 if __name__ == "__main__":
+    stage = report_startup("imports", startup)
     app = QApplication(sys.argv)
+    stage = report_startup("QApplication", stage)
     window = MainWindow()
+    stage = report_startup("main window", stage)
     window.show()
+    QTimer.singleShot(0, lambda: on_window_shown(stage))
     sys.exit(app.exec_())
@@ -2,6 +2,9 @@ from PyQt5.QtWidgets import QMainWindow, QStackedWidget, QToolBar, QAction
 from ui.dashboard_page import DashboardPage
 from ui.admin_page import AdminPage
 from database import DatabaseManager
+from attendance_writer import AttendanceWriter
+from inference_engine import InferenceEngine, INFERENCE_WORKERS
+from match_faces import gallery
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -12,12 +15,18 @@ class MainWindow(QMainWindow):
         # Initialize database manager
         self.db = DatabaseManager()
 
+        # Sign-ins are queued and written in batches by a background thread
+        self.attendance_writer = AttendanceWriter(self.db.db_path)
+
+        # Worker processes for face detection/embedding (None = run in-process)
+        self.inference_engine = InferenceEngine(INFERENCE_WORKERS) if INFERENCE_WORKERS > 0 else None
+
         # Stack for switching between dashboard and admin pages
         self.stack = QStackedWidget()
         self.setCentralWidget(self.stack)
 
         # Create the main pages
-        self.dashboard = DashboardPage(self.db)
+        self.dashboard = DashboardPage(self.db, self.inference_engine, self.attendance_writer)
         self.admin_page = AdminPage(self.db)
 
         # Add pages to the stack
@@ -54,14 +63,23 @@ class MainWindow(QMainWindow):
         """Switch to the admin page and stop the camera if running."""
         if hasattr(self.dashboard, "camera") and self.dashboard.camera is not None:
             self.dashboard.camera.stop()
+        # Make queued sign-ins visible in the attendance list
+        self.attendance_writer.flush()
 
         self.stack.setCurrentWidget(self.admin_page)
 
     def closeEvent(self, event):
-        """Handle application close: stop camera and close database."""
+        """Handle application close: stop camera and inference workers, flush attendance, close database."""
         if hasattr(self.dashboard, "cleanup"):
             self.dashboard.cleanup()
         if hasattr(self.admin_page, "cleanup"):
             self.admin_page.cleanup()
+        self.admin_page.stop_export()
+        if self.inference_engine is not None:
+            self.inference_engine.shutdown()
+        # The pipeline is stopped, so nothing is added after this final flush
+        self.attendance_writer.close()
+        print(f"[DEBUG] Attendance writer: {self.attendance_writer.stats()}")
+        gallery.close()  # Writes the face index if it changed since the last save
         self.db.close()
         event.accept()
@@ -1,61 +1,359 @@
+import os
+import threading
 import numpy as np
-import torch
 import cv2
-from scipy.spatial.distance import cosine
-from face_models import mtcnn, resnet, device
-from face_models import extract_embedding
-import sqlite3
+from face_models import extract_embedding, extract_embeddings
+from database import MAX_SAMPLES_PER_FACE, acquire_pool, register_face_listener, release_pool
+from embedding_codec import EMBEDDING_DIM, EmbeddingFormatError, decode_embedding
+from face_index import ANN_MIN_GALLERY, IVF_NPROBE, BruteForceIndex, IVFIndex, build_index, index_path_for
 
 # Path to the SQLite database
 DATABASE_PATH = "attendance_system.db"
 
 THRESHOLD = 0.3  # Distance threshold for face match
+# "max": score against every enrolled sample and keep the best (most accurate);
+# "centroid": one precomputed mean vector per person (fastest, smallest gallery)
+MATCH_MODE = "max"
+INDEX_SAVE_DELAY = 30  # Seconds without face changes before the IVF index file is rewritten
 
 
-def match_face(image_path):
+def _as_vector(embedding):
+    """Convert a torch tensor, ndarray or stored embedding blob into a 1-D float32 array."""
+    if isinstance(embedding, (bytes, bytearray, memoryview)):
+        return decode_embedding(embedding)
+    if hasattr(embedding, "detach"):
+        embedding = embedding.detach().cpu().numpy()
+    return np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+
+def _as_matrix(embeddings):
+    """Like _as_vector, but keeps (or adds) a leading batch dimension."""
+    if hasattr(embeddings, "detach"):
+        embeddings = embeddings.detach().cpu().numpy()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings.reshape(1, -1) if embeddings.ndim == 1 else embeddings
+
+
+def _normalize(vectors):
+    """L2-normalize a vector or the rows of a matrix (zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class EmbeddingGallery:
+    """
+    In-memory copy of the enrolled faces used for matching.
+
+    All embeddings are kept as one L2-normalized float32 matrix next to an array
+    of names, so a lookup is a single matrix-vector product instead of a SQLite
+    scan. The gallery is loaded on first use and kept in sync through the face
+    listener hook in database.py.
+
+    In "max" mode the matrix holds every sample from face_embeddings and a
+    person may own several rows; in "centroid" mode it holds the precomputed
+    faces.embedding centroid, one row per person.
+
+    Lookups go through a face_index index: an exact scan for ordinary
+    galleries, and an IVF index (persisted next to the database) once the
+    gallery reaches ANN_MIN_GALLERY rows. nprobe trades recall for latency.
+    Face changes update the index in memory; the file is rewritten once they
+    have stopped for INDEX_SAVE_DELAY seconds, and by close().
     """
-    Detects a face in the given image, extracts its embedding, and compares it
-    to stored embeddings in the database to find the best match.
+
+    def __init__(self, db_path=DATABASE_PATH, mode=MATCH_MODE, nprobe=IVF_NPROBE):
+        if mode not in ("max", "centroid"):
+            raise ValueError(f"Unknown match mode: {mode}")
+        self.db_path = db_path
+        self.mode = mode
+        self.index_path = index_path_for(db_path, mode)
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._names = np.empty(0, dtype=object)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._index = BruteForceIndex()
+        self._pool = None
+        self._loaded = False
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._unsaved = False
+
+    def _query_rows(self, name=None):
+        """(name, blob) rows of the whole gallery, or of one person."""
+        if self.mode == "centroid":
+            query = "SELECT name, embedding FROM faces WHERE enrolled = 1"
+        else:
+            query = ("SELECT f.name, e.embedding FROM face_embeddings e "
+                     "JOIN faces f ON f.id = e.face_id WHERE f.enrolled = 1")
+        if name is not None:
+            query += " AND f.name = ?" if self.mode == "max" else " AND name = ?"
+        if self._pool is None:
+            self._pool = acquire_pool(self.db_path)  # Held for the gallery's lifetime
+        with self._pool.read() as conn:
+            return conn.execute(query, () if name is None else (name,)).fetchall()
+
+    @staticmethod
+    def _index_keys(names):
+        """Stable per-row keys for the persisted index: name plus sample number."""
+        seen = {}
+        keys = []
+        for name in names:
+            seen[name] = seen.get(name, -1) + 1
+            keys.append(f"{name}\x00{seen[name]}")
+        return keys
+
+    def load(self):
+        """(Re)load every embedding from the database."""
+        names, vectors = [], []
+        for name, blob in self._query_rows():
+            # A corrupt or foreign row is skipped instead of breaking the whole gallery
+            try:
+                vector = decode_embedding(blob, expected_dim=EMBEDDING_DIM)
+            except EmbeddingFormatError as e:
+                print(f"[DEBUG] Skipping embedding of {name}: {e}")
+                continue
+            names.append(name)
+            vectors.append(vector)
+
+        matrix = _normalize(np.vstack(vectors)) if vectors else np.empty((0, 0), dtype=np.float32)
+        index = build_index(self._index_keys(names), matrix, self.index_path, self.nprobe)
+        with self._lock:
+            self._names = np.array(names, dtype=object)
+            self._matrix = matrix
+            self._index = index
+            self._loaded = True
+
+    def invalidate(self):
+        """Drop the cached matrix; it is reloaded on the next lookup."""
+        with self._lock:
+            self._loaded = False
+
+    def __len__(self):
+        return len(self._snapshot()[0])
+
+    def _snapshot(self):
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            return self._names, self._matrix, self._index
+
+    def search(self, embedding, k=1):
+        """
+        Find the k closest enrolled faces.
+
+        Args:
+            embedding: Query embedding (torch.Tensor, np.ndarray or float32 bytes).
+            k (int): Number of results.
+
+        Returns:
+            list: (name, cosine_distance) tuples ordered from closest to farthest.
+        """
+        names, matrix, index = self._snapshot()
+        if len(names) == 0:
+            return []
+
+        query = _normalize(_as_vector(embedding))
+        if query.shape[0] != matrix.shape[1]:
+            print(f"[DEBUG] Query embedding size {query.shape[0]} does not match gallery.")
+            return []
+
+        # A person may own several rows; over-fetch so k distinct names remain
+        fetch = k if self.mode == "centroid" else k * MAX_SAMPLES_PER_FACE
+        rows, similarities = index.search(matrix, query.reshape(1, -1), fetch)
+        results, seen = [], set()
+        for i, sim in zip(rows[0], similarities[0]):
+            if np.isfinite(sim) and names[i] not in seen:
+                seen.add(names[i])
+                results.append((names[i], float(1.0 - sim)))
+        return results[:k]
+
+    def match_many(self, embeddings):
+        """
+        Match a batch of query embeddings with a single matrix multiply.
+
+        Args:
+            embeddings: NxD batch of query embeddings (torch.Tensor or np.ndarray).
+
+        Returns:
+            list: One (name, distance) per query; (None, inf) for all if the gallery is empty.
+        """
+        queries = _as_matrix(embeddings)
+        names, matrix, index = self._snapshot()
+        if len(names) == 0 or len(queries) == 0:
+            return [(None, float("inf"))] * len(queries)
+        if queries.shape[1] != matrix.shape[1]:
+            print(f"[DEBUG] Query embedding size {queries.shape[1]} does not match gallery.")
+            return [(None, float("inf"))] * len(queries)
+
+        rows, similarities = index.search(matrix, _normalize(queries), k=1)
+        return [(names[i], float(1.0 - sim)) if np.isfinite(sim) else (None, float("inf"))
+                for i, sim in zip(rows[:, 0], similarities[:, 0])]
+
+    def best_match(self, embedding):
+        """
+        Returns:
+            tuple: (name, distance) of the closest face, or (None, inf) if the gallery is empty.
+        """
+        results = self.search(embedding, k=1)
+        return results[0] if results else (None, float("inf"))
+
+    def on_faces_changed(self, db_path, event, name, value=None):
+        """Apply a faces table change in place (see database.register_face_listener)."""
+        if os.path.abspath(db_path) != os.path.abspath(self.db_path) or not self._loaded:
+            return
+
+        if event == "add" or event == "update":
+            # value is the new centroid; in max mode the person's samples are re-read
+            blobs = [value] if self.mode == "centroid" else [blob for _, blob in self._query_rows(name)]
+            try:
+                vectors = _normalize(np.vstack([decode_embedding(blob, expected_dim=EMBEDDING_DIM)
+                                                 for blob in blobs]))
+            except (EmbeddingFormatError, ValueError):
+                self.invalidate()
+                return
+
+        with self._lock:
+            if not self._loaded:
+                return
+            names, matrix, index = self._names, self._matrix, self._index
+
+            if event in ("add", "update", "delete"):
+                keep = names != name
+                names, matrix, index = names[keep], matrix[keep], index.remove(keep)
+            if event == "add" or event == "update":
+                names = np.concatenate([names, np.full(len(vectors), name, dtype=object)])
+                matrix = np.vstack([matrix, vectors]) if matrix.size else vectors
+                index = index.add(vectors)
+            elif event == "rename":
+                names = names.copy()
+                names[names == name] = value
+            elif event != "delete":
+                self._loaded = False
+                return
+
+            # Swap in fresh arrays so readers holding the old snapshot are unaffected
+            self._names, self._matrix, self._index = names, matrix, index
+
+        self._refresh_index(names, matrix, index)
+
+    def _refresh_index(self, names, matrix, index):
+        """
+        Persist an incrementally updated index, or rebuild it when the gallery
+        crossed ANN_MIN_GALLERY or outgrew the trained IVF centroids.
+        """
+        wants_ivf = len(matrix) >= ANN_MIN_GALLERY
+        if wants_ivf == isinstance(index, IVFIndex) and not (wants_ivf and index.needs_retraining(len(matrix))):
+            if wants_ivf:
+                self._schedule_save()
+            return
+
+        index = build_index(self._index_keys(names), matrix, self.index_path, self.nprobe)
+        with self._lock:
+            # Only install it if no other change landed while it was building
+            if self._matrix is matrix:
+                self._index = index
+
+    def _schedule_save(self):
+        """(Re)start the countdown to save_index(), so a burst of changes is written once."""
+        with self._lock:
+            self._unsaved = True
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(INDEX_SAVE_DELAY, self.save_index)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save_index(self):
+        """Write the IVF index file now if face changes have not been saved yet."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                names, matrix, index = self._names, self._matrix, self._index
+                unsaved, self._unsaved = self._unsaved, False
+            # A stale file would also be repaired on load, see IVFIndex.load
+            if unsaved and isinstance(index, IVFIndex):
+                index.save(self.index_path, self._index_keys(names), matrix)
+
+    def close(self):
+        """Save pending index changes and release the database connections."""
+        self.save_index()
+        if self._pool is not None:
+            release_pool(self._pool)
+            self._pool = None
+
+
+gallery = EmbeddingGallery()
+register_face_listener(gallery.on_faces_changed)
+
+
+def match_face_array(frame_bgr):
+    """
+    Recognize the face in an in-memory BGR frame (as delivered by OpenCV).
+
+    The frame is handed to the detector as a channel-reversed view, so no
+    encode/decode or colour conversion copy is made here.
 
     Args:
-        image_path (str): Path to the image to be recognized.
+        frame_bgr (np.ndarray): HxWx3 uint8 BGR image.
 
     Returns:
         tuple: (matched_name, distance) if a match is found, otherwise (None, distance)
     """
-    # Load image
-    img_bgr = cv2.imread(image_path)
-    if img_bgr is None:
-        print("Error: Cannot read image.")
+    if frame_bgr is None:
         return None, None
 
-    # Convert image to RGB
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    embedding = extract_embedding(img_rgb)
+    embedding = extract_embedding(frame_bgr[..., ::-1])
     if embedding is None:
         print("[DEBUG] No face detected from input frame.")
         return None, None
 
-    #print("[DEBUG] Extracted embedding shape:", embedding.shape)
-
-    # Compare with embeddings in the database
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, embedding FROM faces")
-    best_match = None
-    best_distance = float("inf")
-
-    for name, blob in cursor.fetchall():
-        stored_embedding = np.frombuffer(blob, dtype=np.float32)
-        distance = cosine(embedding.cpu().numpy(), stored_embedding)
-        #print(f"[DEBUG] Comparing with {name}, distance = {distance:.4f}")
-        if distance < best_distance:
-            best_distance = distance
-            best_match = name
-
-    conn.close()
+    best_match, best_distance = gallery.best_match(embedding)
 
     if best_distance < THRESHOLD:
         return best_match, best_distance
     else:
         return None, best_distance
+
+
+def match_all_faces(frame_bgr, max_faces=None):
+    """
+    Recognize every face in an in-memory BGR frame in one batched pass.
+
+    Args:
+        frame_bgr (np.ndarray): HxWx3 uint8 BGR image.
+        max_faces (int): Optional cap on the number of faces, largest first.
+
+    Returns:
+        list: (matched_name or None, distance, box) for each detected face.
+    """
+    if frame_bgr is None:
+        return []
+
+    embeddings, boxes = extract_embeddings(frame_bgr[..., ::-1], max_faces)
+    if embeddings is None:
+        return []
+
+    results = []
+    for (name, distance), box in zip(gallery.match_many(embeddings), boxes):
+        results.append((name if distance < THRESHOLD else None, distance, box))
+    return results
+
+
+def match_face(image_path):
+    """
+    Load an image from disk and recognize it with match_face_array.
+
+    Args:
+        image_path (str): Path to the image to be recognized.
+
+    Returns:
+        tuple: (matched_name, distance) if a match is found, otherwise (None, distance)
+    """
+    img_bgr = cv2.imread(image_path)
+    if img_bgr is None:
+        print("Error: Cannot read image.")
+        return None, None
+
+    return match_face_array(img_bgr)
@@ -0,0 +1,189 @@
+"""
+Schema migrations for attendance_system.db.
+
+The schema version is kept in PRAGMA user_version. Every entry of MIGRATIONS
+upgrades the database from the previous version and runs in its own
+transaction together with the version bump, so an interrupted upgrade leaves
+the file at the last completed version. To change the schema, append a new
+(version, description, function) entry; never edit one that has shipped.
+
+    python migrations.py [attendance_system.db]
+"""
+import sys
+import time
+from datetime import datetime
+
+from attendance_archive import create_partition_table
+from attendance_rollup import create_rollup_table, rebuild_daily
+from attendance_search import create_search_index
+from embedding_codec import migrate_embeddings
+
+
+def _encode_embeddings(conn):
+    # Raw float32 blobs from older versions -> embedding_codec format
+    migrate_embeddings(conn)
+
+
+def _add_face_samples(conn):
+    # Every enrolled sample; faces.embedding holds their precomputed centroid
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS face_embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            face_id INTEGER NOT NULL REFERENCES faces(id) ON DELETE CASCADE,
+            embedding BLOB NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_face_embeddings_face ON face_embeddings(face_id)")
+    # Faces enrolled before face_embeddings existed become their own first sample
+    conn.execute("""
+        INSERT INTO face_embeddings (face_id, embedding, created_at)
+        SELECT id, embedding, ? FROM faces
+        WHERE id NOT IN (SELECT face_id FROM face_embeddings)
+    """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+
+
+def _index_attendance(conn):
+    # Name filters (with or without a date range) and date-only filters / ordering
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_name_timestamp ON attendance(name, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance(timestamp)")
+    conn.execute("ANALYZE")
+
+
+def _add_daily_rollups(conn):
+    # Schema of version 4; _compact_attendance moved it to person_id and epoch seconds
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (name, date)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_daily_date ON attendance_daily(date)")
+    conn.execute("""
+        INSERT INTO attendance_daily (name, date, first_seen, last_seen, count)
+        SELECT name, substr(timestamp, 1, 10), min(timestamp), max(timestamp), count(*)
+        FROM attendance GROUP BY 1, 2
+    """)
+
+
+def _index_attendance_names(conn):
+    # Schema of version 5; replaced by faces_fts in _compact_attendance
+    conn.execute("CREATE TABLE IF NOT EXISTS attendance_names (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS attendance_names_fts
+        USING fts5(name, content='attendance_names', content_rowid='id', tokenize='trigram')
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS attendance_names_ai AFTER INSERT ON attendance_names BEGIN
+            INSERT INTO attendance_names_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    conn.execute("INSERT OR IGNORE INTO attendance_names (name) SELECT DISTINCT name FROM attendance")
+
+
+def _compact_attendance(conn):
+    # faces becomes the person table: people removed from recognition keep their row
+    # (enrolled = 0) so their history keeps its name. Names only ever seen in attendance
+    # get such a row with an empty placeholder embedding, which is never loaded.
+    conn.execute("ALTER TABLE faces ADD COLUMN enrolled INTEGER NOT NULL DEFAULT 1")
+    conn.execute("""
+        INSERT INTO faces (name, embedding, enrolled)
+        SELECT DISTINCT name, x'', 0 FROM attendance WHERE name NOT IN (SELECT name FROM faces)
+    """)
+
+    # attendance(name TEXT, timestamp TEXT) -> attendance(person_id, ts epoch seconds); ids are kept.
+    # The old strings are local time, which strftime's 'utc' modifier converts from.
+    conn.execute("""
+        CREATE TABLE attendance_compact (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id INTEGER NOT NULL REFERENCES faces(id),
+            ts INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT INTO attendance_compact (id, person_id, ts)
+        SELECT a.id, f.id, CAST(strftime('%s', a.timestamp, 'utc') AS INTEGER)
+        FROM attendance a JOIN faces f ON f.name = a.name ORDER BY a.id
+    """)
+    conn.execute("DROP TABLE attendance")
+    conn.execute("ALTER TABLE attendance_compact RENAME TO attendance")
+    conn.execute("CREATE INDEX idx_attendance_person_ts ON attendance(person_id, ts)")
+    conn.execute("CREATE INDEX idx_attendance_ts ON attendance(ts)")
+
+    conn.execute("DROP TABLE attendance_daily")
+    create_rollup_table(conn)
+    rebuild_daily(conn)
+
+    conn.execute("DROP TABLE attendance_names_fts")
+    conn.execute("DROP TABLE attendance_names")
+    create_search_index(conn)
+    conn.execute("ANALYZE")
+
+
+def _add_attendance_partitions(conn):
+    # Registry of the per-period archive databases, see attendance_archive
+    create_partition_table(conn)
+
+
+MIGRATIONS = [
+    (1, "versioned embedding format", _encode_embeddings),
+    (2, "face_embeddings samples table", _add_face_samples),
+    (3, "attendance indexes", _index_attendance),
+    (4, "daily attendance rollups", _add_daily_rollups),
+    (5, "attendance name search index", _index_attendance_names),
+    (6, "integer person_id / epoch attendance", _compact_attendance),
+    (7, "attendance archive partitions", _add_attendance_partitions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    Bring the database up to SCHEMA_VERSION.
+
+    Returns:
+        list: Versions that were applied.
+    """
+    current = schema_version(conn)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {current} is newer than this program ({SCHEMA_VERSION})")
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        start = time.perf_counter()
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN")
+        try:
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        print(f"[DEBUG] Applied migration {version} ({description}) in {time.perf_counter() - start:.2f}s")
+    return applied
+
+
+if __name__ == "__main__":
+    from database import connect
+    connection = connect(sys.argv[1] if len(sys.argv) > 1 else "attendance_system.db")
+    try:
+        before = schema_version(connection)
+        if apply_migrations(connection):
+            connection.execute("VACUUM")  # Return the space freed by rewritten tables to the OS
+        print(f"Schema version {before} -> {schema_version(connection)}")
+    finally:
+        connection.close()
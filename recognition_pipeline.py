@@ -0,0 +1,308 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any
+
+from attendance_writer import AttendanceWriter
+from database import DATABASE_PATH
+from face_models import detect_faces, extract_embeddings_from_boxes
+from face_tracker import FaceTracker
+from match_faces import gallery, THRESHOLD
+
+SIGN_IN_COOLDOWN = 30  # Seconds before the same person can be signed in again
+QUEUE_SIZE = 2  # Frames buffered between two stages before the oldest is dropped
+MAX_FACES = 6  # Faces recognized per frame in multi-face mode, largest first
+INFERENCE_TIMEOUT = 5  # Seconds to wait for an engine slot or result before giving up on a frame
+
+
+class DropOldestQueue:
+    """
+    Bounded FIFO shared by two pipeline stages.
+
+    put() never blocks: when the queue is full the oldest item is discarded, so a
+    slow consumer always works on the most recent frames and latency stays bounded.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest item, or None once the queue is closed (or on timeout)."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._items)
+
+
+@dataclass
+class FrameJob:
+    """A captured frame travelling through the pipeline, filled in stage by stage."""
+    frame_id: int
+    frame: Any  # BGR ndarray
+    captured_at: float
+    detected: bool = False  # True if boxes/landmarks came with the frame
+    boxes: Any = None
+    landmarks: Any = None
+    track_ids: list = field(default_factory=list)  # Track of each box
+    embed_indices: list = field(default_factory=list)  # Boxes that need a fresh embedding
+    embeddings: Any = None  # One row per entry of embed_indices
+    names: list = field(default_factory=list)
+    distances: list = field(default_factory=list)
+
+
+@dataclass
+class RecognitionResult:
+    """Lightweight outcome of one frame, safe to hand to the GUI thread."""
+    frame_id: int
+    boxes: list = field(default_factory=list)
+    track_ids: list = field(default_factory=list)
+    names: list = field(default_factory=list)
+    distances: list = field(default_factory=list)
+    signed: list = field(default_factory=list)  # Names that were newly signed in
+    latency: float = 0.0
+
+
+class PipelineStage(threading.Thread):
+    """
+    Worker thread that takes jobs from inbox, applies func and forwards the
+    return value to outbox. Returning None drops the job.
+    """
+
+    def __init__(self, name, func, inbox, outbox=None, setup=None, teardown=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.setup = setup
+        self.teardown = teardown
+        self.processed = 0
+        self.busy_time = 0.0
+
+    def run(self):
+        if self.setup:
+            self.setup()
+        try:
+            while not self.inbox.closed:
+                job = self.inbox.get(timeout=0.5)
+                if job is None:
+                    continue
+                start = time.perf_counter()
+                try:
+                    job = self.func(job)
+                except Exception as e:
+                    print(f"[DEBUG] {self.name} stage failed: {e}")
+                    job = None
+                self.busy_time += time.perf_counter() - start
+                self.processed += 1
+                if job is not None and self.outbox is not None:
+                    self.outbox.put(job)
+        finally:
+            if self.teardown:
+                self.teardown()
+
+
+class RecognitionPipeline:
+    """
+    Staged recognition pipeline: detect -> embed -> match -> record.
+
+    Frames are pushed with submit() from the capture thread, normally together
+    with the detections the camera already made; the detect stage then only
+    selects faces and MTCNN runs once per frame. With tracking enabled, faces are
+    followed across frames by a FaceTracker and only new tracks, tracks due for a
+    periodic re-check and uncertain tracks are embedded; the rest keep their identity. Every stage runs in
+    its own thread and talks to the next one through a DropOldestQueue, so a slow
+    stage never blocks capture or the GUI. on_result is called from the record
+    thread with a RecognitionResult for every frame that made it through.
+    Sign-ins are handed to an AttendanceWriter (a private one unless writer is
+    given), so the record stage never waits on SQLite either.
+    """
+
+    def __init__(self, db_path=DATABASE_PATH, on_result=None, queue_size=QUEUE_SIZE,
+                 cooldown=SIGN_IN_COOLDOWN, max_faces=MAX_FACES, track_faces=True, engine=None,
+                 writer=None):
+        self.db_path = db_path
+        self.engine = engine  # Optional InferenceEngine that embeds in worker processes
+        self._owns_writer = writer is None
+        self.writer = writer or AttendanceWriter(db_path)
+        self.on_result = on_result
+        self.cooldown = cooldown
+        self.max_faces = max_faces  # 1 = single-face mode
+        self.tracker = FaceTracker(THRESHOLD) if track_faces else None
+        self.last_signed_time = {}
+        self._next_frame_id = 0
+
+        self.queues = [DropOldestQueue(queue_size) for _ in range(4)]
+        detect_q, embed_q, match_q, record_q = self.queues
+        self.stages = [
+            PipelineStage("detect", self._detect, detect_q, embed_q),
+            PipelineStage("embed", self._embed, embed_q, match_q),
+            PipelineStage("match", self._match, match_q, record_q),
+            PipelineStage("record", self._record, record_q),
+        ]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for queue in self.queues:
+            queue.close()
+        for stage in self.stages:
+            if stage.is_alive():
+                stage.join(timeout=2)
+        if self._owns_writer:
+            self.writer.close()
+
+    def submit(self, frame, detections=None):
+        """
+        Queue a BGR frame for recognition. Safe to call from any thread.
+
+        Args:
+            frame (np.ndarray): BGR frame.
+            detections (tuple): Optional (boxes, landmarks) already found on this frame.
+                If omitted the detect stage runs MTCNN itself.
+        """
+        self._next_frame_id += 1
+        job = FrameJob(self._next_frame_id, frame, time.perf_counter())
+        if detections is not None:
+            job.detected = True
+            job.boxes, job.landmarks = detections
+        self.queues[0].put(job)
+
+    def stats(self):
+        """Per-stage counters (processed jobs, average busy time, dropped inputs) and writer metrics."""
+        stats = {
+            stage.name: {
+                "processed": stage.processed,
+                "avg_ms": 1000 * stage.busy_time / stage.processed if stage.processed else 0.0,
+                "dropped": stage.inbox.dropped,
+            }
+            for stage in self.stages
+        }
+        stats["writer"] = self.writer.stats()
+        return stats
+
+    # Stage functions
+
+    def _detect(self, job):
+        if not job.detected:
+            job.boxes, _, job.landmarks = detect_faces(job.frame[..., ::-1])
+            job.detected = True
+        if job.boxes is not None and len(job.boxes):
+            # Boxes are sorted largest first; keep the most prominent faces
+            job.boxes = job.boxes[:self.max_faces]
+            job.landmarks = job.landmarks[:self.max_faces] if job.landmarks is not None else None
+        else:
+            job.boxes = None
+
+        if self.tracker is not None:
+            job.track_ids, job.embed_indices = self.tracker.update(job.boxes)
+        elif job.boxes is not None:
+            job.embed_indices = list(range(len(job.boxes)))
+        return job
+
+    def _embed(self, job):
+        if job.embed_indices and self.engine is not None:
+            # Hand off to a worker process; the match stage waits on the future, so
+            # several frames can be in flight at once
+            try:
+                job.embeddings = self.engine.submit(job.frame, job.boxes[job.embed_indices],
+                                                    timeout=INFERENCE_TIMEOUT)
+            except (queue.Empty, RuntimeError) as e:
+                print(f"[DEBUG] Inference engine unavailable ({e!r}); embedding frame {job.frame_id} in-process")
+                job.embeddings = extract_embeddings_from_boxes(job.frame[..., ::-1],
+                                                               job.boxes[job.embed_indices])
+        elif job.embed_indices:
+            # All faces that need checking go through the network as one batch
+            job.embeddings = extract_embeddings_from_boxes(job.frame[..., ::-1],
+                                                           job.boxes[job.embed_indices])
+        job.frame = None  # Only the embeddings are needed from here on
+        return job
+
+    def _match(self, job):
+        if job.boxes is None:
+            return job
+
+        if isinstance(job.embeddings, Future):
+            try:
+                _, job.embeddings = job.embeddings.result(timeout=INFERENCE_TIMEOUT)
+            except (FutureTimeoutError, RuntimeError) as e:
+                # The frame is gone by now, so there is nothing to re-embed; the next frame will do
+                print(f"[DEBUG] Dropping frame {job.frame_id}: embedding failed ({e!r})")
+                return None
+
+        matches = {}
+        if job.embeddings is not None:
+            matches = dict(zip(job.embed_indices, gallery.match_many(job.embeddings)))
+
+        for i in range(len(job.boxes)):
+            if self.tracker is not None:
+                if i in matches:
+                    self.tracker.observe(job.track_ids[i], *matches[i])
+                name, distance = self.tracker.identity(job.track_ids[i])
+            else:
+                name, distance = matches.get(i, (None, None))
+                if distance is not None and distance >= THRESHOLD:
+                    name = None
+            job.names.append(name)
+            job.distances.append(distance)
+        return job
+
+    def _record(self, job):
+        latency = time.perf_counter() - job.captured_at
+        if job.boxes is None:
+            self._emit(RecognitionResult(job.frame_id, latency=latency))
+            return None
+
+        signed = []
+        now = time.time()
+        for name in job.names:
+            if name and name not in signed and now - self.last_signed_time.get(name, 0) >= self.cooldown:
+                self.writer.add(name)
+                self.last_signed_time[name] = now
+                signed.append(name)
+
+        self._emit(RecognitionResult(
+            job.frame_id,
+            boxes=[[int(v) for v in box] for box in job.boxes],
+            track_ids=job.track_ids,
+            names=job.names,
+            distances=job.distances,
+            signed=signed,
+            latency=latency,
+        ))
+        return None
+
+    def _emit(self, result):
+        if self.on_result is not None:
+            self.on_result(result)
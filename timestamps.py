@@ -0,0 +1,31 @@
+"""
+Attendance times are stored as integer Unix epoch seconds and shown as local
+'YYYY-MM-DD HH:MM:SS' strings. In SQL the conversion is
+datetime(ts, 'unixepoch', 'localtime'); these are the Python equivalents.
+"""
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def to_epoch(value) -> int:
+    """Epoch seconds of an epoch number, a datetime, or a local 'YYYY-MM-DD[ HH:MM:SS]' string."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.strptime(value, DATE_FORMAT if len(value) == 10 else TIMESTAMP_FORMAT)
+    return int(value.timestamp())
+
+
+def format_epoch(ts: int) -> str:
+    return datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT)
+
+
+def day_range(date: str) -> tuple[int, int]:
+    """
+    Turn 'YYYY-MM-DD' into [start, end) epoch bounds of that local day, so a date
+    filter is an indexable range predicate instead of a per-row conversion.
+    """
+    day = datetime.strptime(date, DATE_FORMAT)
+    return int(day.timestamp()), int((day + timedelta(days=1)).timestamp())
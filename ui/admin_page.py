@@ -1,13 +1,18 @@
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QLineEdit,
-    QFileDialog, QMessageBox, QTableWidget, QTableWidgetItem
+    QFileDialog, QMessageBox, QTableWidget, QTableWidgetItem, QTableView, QCheckBox, QAbstractItemView,
+    QProgressDialog
 )
+from PyQt5.QtCore import Qt, QDate, QTimer
 from ui.utils import load_rgb_image, show_info_message, show_warning_message
 from face_models import extract_embedding
 from ui.capture_face_dialog import CaptureFaceDialog
-from database import DatabaseManager
+from ui.attendance_model import AttendanceTableModel
+from ui.export_thread import AttendanceExportThread
+from database import DatabaseManager, AttendanceFilter
 from PyQt5.QtWidgets import QDateEdit
-import csv
+
+SEARCH_DEBOUNCE_MS = 250  # Pause in typing before the attendance search runs
 
 
 class AdminPage(QWidget):
@@ -28,6 +33,10 @@ class AdminPage(QWidget):
         self.list_btn.clicked.connect(self.show_attendance)
         self.layout.addWidget(self.list_btn)
 
+        self.summary_btn = QPushButton("Attendance Summary")
+        self.summary_btn.clicked.connect(self.show_summary)
+        self.layout.addWidget(self.summary_btn)
+
         # Sub-buttons for face management
         self.sub_button_layout = QHBoxLayout()
         self.layout.addLayout(self.sub_button_layout)
@@ -60,6 +69,19 @@ class AdminPage(QWidget):
         self.table.setHorizontalHeaderLabels(["Names"])
         self.layout.addWidget(self.table)
 
+        # Attendance can run to millions of rows, so it gets a paged model instead of table items
+        self.attendance_model = None
+        self.attendance_view = QTableView()
+        self.attendance_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.attendance_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.attendance_view.horizontalHeader().setStretchLastSection(True)
+        self.layout.addWidget(self.attendance_view)
+        self.attendance_view.hide()
+        self.attendance_count_label = QLabel()
+        self.layout.addWidget(self.attendance_count_label)
+        self.attendance_count_label.hide()
+
+        self.export_thread = None
         self.pending_embedding = None
 
     def clear_controls(self):
@@ -79,6 +101,9 @@ class AdminPage(QWidget):
         self.update_btn.show()
         self.view_btn.show()
         self.clear_controls()
+        self.attendance_view.hide()
+        self.attendance_count_label.hide()
+        self.table.show()
         self.table.clearContents()
         self.table.setRowCount(0)
 
@@ -112,18 +137,32 @@ class AdminPage(QWidget):
         name_input.setPlaceholderText("Enter name")
         filter_layout.addWidget(name_input)
 
-        # Date filter input
-        date_input = QDateEdit()
-        date_input.setDisplayFormat("yyyy-MM-dd")
-        date_input.setCalendarPopup(True)
-        filter_layout.addWidget(date_input)
+        # Date range filter, off by default so the first view is unfiltered
+        date_check = QCheckBox("From")
+        filter_layout.addWidget(date_check)
+        date_from_input = QDateEdit(QDate.currentDate())
+        date_to_input = QDateEdit(QDate.currentDate())
+        for date_input in (date_from_input, date_to_input):
+            date_input.setDisplayFormat("yyyy-MM-dd")
+            date_input.setCalendarPopup(True)
+            date_input.setEnabled(False)
+        date_check.toggled.connect(date_from_input.setEnabled)
+        date_check.toggled.connect(date_to_input.setEnabled)
+        filter_layout.addWidget(date_from_input)
+        filter_layout.addWidget(QLabel("to"))
+        filter_layout.addWidget(date_to_input)
+
+        # Keyword filter input
+        keyword_input = QLineEdit()
+        keyword_input.setPlaceholderText("Search, e.g. alice 2026-03")
+        filter_layout.addWidget(keyword_input)
 
         # Search button
         search_btn = QPushButton("Search")
         filter_layout.addWidget(search_btn)
 
         # Export button
-        export_btn = QPushButton("Export CSV")
+        export_btn = QPushButton("Export")
         filter_layout.addWidget(export_btn)
 
         # Delete button
@@ -133,66 +172,148 @@ class AdminPage(QWidget):
         self.control_layout.addLayout(filter_layout)
 
         # Table setup
-        records = self.db.get_attendance_records()
-        self.table.clearContents()
-        self.table.setRowCount(len(records))
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["ID", "Name", "Timestamp"])
-        self.table.setColumnHidden(0, True)
-
-        for row, (id_, name, timestamp) in enumerate(records):
-            self.table.setItem(row, 0, QTableWidgetItem(str(id_)))
-            self.table.setItem(row, 1, QTableWidgetItem(name))
-            self.table.setItem(row, 2, QTableWidgetItem(timestamp))
+        self.table.hide()
+        if self.attendance_model is None:
+            self.attendance_model = AttendanceTableModel(self.db, parent=self)
+            self.attendance_model.rowsInserted.connect(self.update_attendance_count)
+            self.attendance_model.modelReset.connect(self.update_attendance_count)
+            self.attendance_view.setModel(self.attendance_model)
+            self.attendance_view.setColumnHidden(0, True)
+            self.attendance_view.horizontalHeader().setSortIndicator(2, Qt.DescendingOrder)
+            self.attendance_view.setSortingEnabled(True)
+        model = self.attendance_model
+        self.attendance_view.show()
+        self.attendance_count_label.show()
+
+        def current_filters():
+            date_from = date_to = None
+            if date_check.isChecked():
+                date_from = date_from_input.date().toString("yyyy-MM-dd")
+                date_to = date_to_input.date().toString("yyyy-MM-dd")
+            return AttendanceFilter(name=name_input.text().strip() or None, date_from=date_from,
+                                    date_to=date_to, keyword=keyword_input.text().strip() or None)
 
         # Search logic
         def apply_filters():
-            name = name_input.text().strip()
-            date = date_input.date().toString("yyyy-MM-dd")
-            if not name:
-                name = None
-            if not date_input.date().isValid():
-                date = None
-            filtered = self.db.get_attendance_records(name=name, date=date)
-
-            self.table.setRowCount(len(filtered))
-            for row, (id_, name, timestamp) in enumerate(filtered):
-                self.table.setItem(row, 0, QTableWidgetItem(str(id_)))
-                self.table.setItem(row, 1, QTableWidgetItem(name))
-                self.table.setItem(row, 2, QTableWidgetItem(timestamp))
+            model.set_filters(current_filters())
 
         search_btn.clicked.connect(apply_filters)
+        name_input.returnPressed.connect(apply_filters)
+        keyword_input.returnPressed.connect(apply_filters)
+
+        # Search as you type, once typing pauses; each search loads only the first page
+        search_timer = QTimer(keyword_input)
+        search_timer.setSingleShot(True)
+        search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        search_timer.timeout.connect(apply_filters)
+        keyword_input.textChanged.connect(search_timer.start)
+        apply_filters()  # Reset filters from a previous visit and pick up new records
 
         # Export logic
-        def export_csv():
-            path, _ = QFileDialog.getSaveFileName(self, "Save File", "", "CSV Files (*.csv)")
+        def export_records():
+            path, _ = QFileDialog.getSaveFileName(self, "Save File", "",
+                                                  "CSV Files (*.csv);;Parquet Files (*.parquet)")
             if path:
-                with open(path, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["ID", "Name", "Timestamp"])
-                    for row in range(self.table.rowCount()):
-                        row_data = [self.table.item(row, col).text() for col in range(3)]
-                        writer.writerow(row_data)
-                show_info_message(self, "Exported", f"File saved to {path}")
+                self.export_attendance(path, model.filters, model.sort_key, model.descending)
 
-        export_btn.clicked.connect(export_csv)
+        export_btn.clicked.connect(export_records)
 
         # Delete logic
         def delete_selected():
-            selected = self.table.currentRow()
-            if selected < 0:
+            record_id = model.record_id(self.attendance_view.currentIndex().row())
+            if record_id is None:
                 show_info_message(self, "Error", "Please select a row to delete.")
                 return
-            record_id = self.table.item(selected, 0).text()
             confirm = QMessageBox.question(self, "Confirm", f"Delete record ID {record_id}?",
                                            QMessageBox.Yes | QMessageBox.No)
             if confirm == QMessageBox.Yes:
-                self.db.cursor.execute("DELETE FROM attendance WHERE id = ?", (record_id,))
-                self.db.conn.commit()
-                apply_filters()
+                self.db.delete_attendance_record_by_id(record_id)
+                model.refresh()
 
         delete_btn.clicked.connect(delete_selected)
 
+    def show_summary(self):
+        """Per-person attendance over a date range, read from the daily rollups only."""
+        self.add_btn.hide()
+        self.del_btn.hide()
+        self.update_btn.hide()
+        self.view_btn.hide()
+        self.clear_controls()
+        self.attendance_view.hide()
+        self.attendance_count_label.hide()
+        self.table.show()
+
+        filter_layout = QHBoxLayout()
+        today = QDate.currentDate()
+        date_from_input = QDateEdit(QDate(today.year(), today.month(), 1))
+        date_to_input = QDateEdit(today)
+        for date_input in (date_from_input, date_to_input):
+            date_input.setDisplayFormat("yyyy-MM-dd")
+            date_input.setCalendarPopup(True)
+        filter_layout.addWidget(QLabel("From"))
+        filter_layout.addWidget(date_from_input)
+        filter_layout.addWidget(QLabel("to"))
+        filter_layout.addWidget(date_to_input)
+        show_btn = QPushButton("Show")
+        filter_layout.addWidget(show_btn)
+        self.control_layout.addLayout(filter_layout)
+
+        days_label = QLabel()
+        self.control_layout.addWidget(days_label)
+
+        headers = ["Name", "Days Present", "Rate", "Sign-ins", "First Seen", "Last Seen"]
+        self.table.clearContents()
+        self.table.setColumnCount(len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.setColumnHidden(0, False)
+
+        def load_summary():
+            session_days, rows = self.db.get_attendance_summary(date_from_input.date().toString("yyyy-MM-dd"),
+                                                                date_to_input.date().toString("yyyy-MM-dd"))
+            days_label.setText(f"{session_days} days with attendance, {len(rows)} people")
+            self.table.setRowCount(len(rows))
+            for row, (name, days, sign_ins, first_seen, last_seen) in enumerate(rows):
+                rate = f"{100 * days / session_days:.0f}%" if session_days else "-"
+                for col, value in enumerate([name, str(days), rate, str(sign_ins), first_seen, last_seen]):
+                    self.table.setItem(row, col, QTableWidgetItem(value))
+
+        show_btn.clicked.connect(load_summary)
+        load_summary()
+
+    def export_attendance(self, path, filters, sort, descending):
+        """Stream the filtered records to path in a background thread, with a cancellable progress dialog."""
+        if self.export_thread is not None and self.export_thread.isRunning():
+            show_warning_message(self, "Busy", "An export is already running.")
+            return
+        progress = QProgressDialog("Exporting attendance...", "Cancel", 0, 0, self)
+        progress.setWindowTitle("Export")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        thread = AttendanceExportThread(self.db, path, filters, sort, descending, parent=self)
+
+        def on_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            progress.setLabelText(f"Exported {done} of {total} records...")
+
+        def on_done(count, error):
+            progress.close()
+            if not error:
+                show_info_message(self, "Exported", f"{count} records saved to {path}")
+            elif error != "cancelled":
+                show_warning_message(self, "Export Failed", error)
+
+        thread.progress_signal.connect(on_progress)
+        thread.done_signal.connect(on_done)
+        progress.canceled.connect(thread.cancel)
+        self.export_thread = thread
+        thread.start()
+
+    def update_attendance_count(self):
+        model = self.attendance_model
+        self.attendance_count_label.setText(f"Showing {model.rowCount()} of {model.total()} records")
+
     def show_add_face(self):
         self.clear_controls()
         self.pending_embedding = None
@@ -212,12 +333,12 @@ class AdminPage(QWidget):
 
         self.control_layout.addLayout(row_layout)
 
-        def prepare_embedding(img):
-            if img is None:
+        def prepare_embedding(embeddings):
+            if not embeddings:
                 show_warning_message(self, "Error", "No face detected.")
                 return
-            self.pending_embedding = extract_embedding(img)
-            show_info_message(self, "Ready", "Embedding ready. Click Confirm to save.")
+            self.pending_embedding = embeddings
+            show_info_message(self, "Ready", f"{len(embeddings)} sample(s) ready. Click Confirm to save.")
 
         def confirm_add():
             name = name_input.text().strip()
@@ -227,15 +348,15 @@ class AdminPage(QWidget):
             if self.pending_embedding is None:
                 show_warning_message(self, "Error", "No image uploaded or captured.")
                 return
-            success = self.db.add_new_face(name, self.pending_embedding.cpu().numpy().tobytes())
+            success = self.db.add_new_face(name, self.pending_embedding)
             if success:
                 show_info_message(self, "Success", f"{name} added.")
             else:
                 show_warning_message(self, "Duplicate", f"{name} already exists.")
             self.show_face_list()
 
-        upload_btn.clicked.connect(lambda: self.load_image_for_embedding(prepare_embedding))
-        capture_btn.clicked.connect(lambda: self.capture_image_for_embedding(prepare_embedding))
+        upload_btn.clicked.connect(lambda: self.load_images_for_embedding(prepare_embedding))
+        capture_btn.clicked.connect(lambda: self.capture_images_for_embedding(prepare_embedding))
         confirm_btn.clicked.connect(confirm_add)
         self.show_face_list()
 
@@ -273,19 +394,21 @@ class AdminPage(QWidget):
         new_name_input.setPlaceholderText("Enter new name (optional)")
         input_layout.addWidget(new_name_input)
 
-        upload_btn = QPushButton("Upload New Image")
+        upload_btn = QPushButton("Upload New Images")
         confirm_btn = QPushButton("Confirm Update")
+        add_samples_btn = QPushButton("Add as Extra Samples")
         input_layout.addWidget(upload_btn)
         input_layout.addWidget(confirm_btn)
+        input_layout.addWidget(add_samples_btn)
 
         self.control_layout.addLayout(input_layout)
 
-        def prepare_embedding(img):
-            if img is None:
+        def prepare_embedding(embeddings):
+            if not embeddings:
                 show_warning_message(self, "Error", "No face detected.")
                 return
-            self.pending_update_embedding = extract_embedding(img)
-            show_info_message(self, "Ready", "Image loaded.")
+            self.pending_update_embedding = embeddings
+            show_info_message(self, "Ready", f"{len(embeddings)} image(s) loaded.")
 
         def confirm_update():
             selected = self.table.currentRow()
@@ -307,13 +430,28 @@ class AdminPage(QWidget):
                     show_warning_message(self, "Error", f"Name '{new_name}' already exists.")
                     return
             if has_new_image:
-                self.db.update_face(new_name, self.pending_update_embedding.cpu().numpy().tobytes())
+                self.db.update_face(new_name, self.pending_update_embedding)
 
             show_info_message(self, "Updated", f"{old_name} updated.")
             self.show_face_list()
 
-        upload_btn.clicked.connect(lambda: self.load_image_for_embedding(prepare_embedding))
+        def add_samples():
+            selected = self.table.currentRow()
+            if selected < 0:
+                show_warning_message(self, "Error", "No selection.")
+                return
+            if self.pending_update_embedding is None:
+                show_warning_message(self, "Error", "No images uploaded.")
+                return
+
+            name = self.table.item(selected, 0).text()
+            self.db.add_face_samples(name, self.pending_update_embedding)
+            show_info_message(self, "Updated", f"Added {len(self.pending_update_embedding)} sample(s) to {name}.")
+            self.pending_update_embedding = None
+
+        upload_btn.clicked.connect(lambda: self.load_images_for_embedding(prepare_embedding))
         confirm_btn.clicked.connect(confirm_update)
+        add_samples_btn.clicked.connect(add_samples)
         self.show_face_list()
 
     def show_face_list(self):
@@ -325,19 +463,26 @@ class AdminPage(QWidget):
         for i, name in enumerate(names):
             self.table.setItem(i, 0, QTableWidgetItem(name))
 
-    def load_image_for_embedding(self, callback):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Images (*.png *.jpg *.jpeg)")
-        if file_name:
+    def load_images_for_embedding(self, callback):
+        """Embed the largest face of each selected image and pass the embeddings to callback."""
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Select Images", "", "Images (*.png *.jpg *.jpeg)")
+        if not file_names:
+            return
+        embeddings = []
+        for file_name in file_names:
             img = load_rgb_image(file_name)
-            callback(img)
+            embedding = extract_embedding(img) if img is not None else None
+            if embedding is not None:
+                embeddings.append(embedding)
+        callback(embeddings)
 
-    def capture_image_for_embedding(self, callback):
+    def capture_images_for_embedding(self, callback):
         dialog = CaptureFaceDialog(self)
         if dialog.exec_():
-            img = dialog.get_captured_image()
+            embeddings = dialog.get_embeddings()
             if hasattr(dialog, 'camera'):
                 dialog.camera.stop()
-            callback(img)
+            callback(embeddings)
 
     def set_selected_name(self, name):
         self.selected_name = name
@@ -345,3 +490,9 @@ class AdminPage(QWidget):
 
     def cleanup(self):
         pass
+
+    def stop_export(self):
+        """Cancel a running export and wait for it, before the database is closed."""
+        if self.export_thread is not None and self.export_thread.isRunning():
+            self.export_thread.cancel()
+            self.export_thread.wait()
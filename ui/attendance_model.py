@@ -0,0 +1,89 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from database import ATTENDANCE_PAGE_SIZE, AttendanceFilter, DatabaseManager
+
+COLUMNS = ["ID", "Name", "Timestamp"]
+SORT_COLUMNS = {1: "name", 2: "timestamp"}  # Column -> ATTENDANCE_SORT_KEYS entry; ID sorts like Timestamp
+COUNT_CAP = 10000  # Matches counted beyond the loaded pages; more are shown as "10000+"
+
+
+class AttendanceTableModel(QAbstractTableModel):
+    """
+    Lazily loaded attendance records for a QTableView.
+
+    Only the pages the view has scrolled to are held in memory. Each page is
+    fetched by keyset (the sort key of the last loaded row), so page 500 costs
+    the same index seek as page 1, and sorting and filtering are done by SQLite.
+    """
+
+    def __init__(self, db: DatabaseManager, page_size=ATTENDANCE_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self.filters = AttendanceFilter()
+        self.sort_key = "timestamp"
+        self.descending = True
+
+        self._rows = []
+        self._total = 0
+        self._exhausted = False
+        self.refresh()
+
+    # --- Qt model interface ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self._rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        after = self.db.attendance_sort_key(self._rows[-1], self.sort_key) if self._rows else None
+        page = self.db.get_attendance_page(self.filters, after, self.page_size, self.sort_key, self.descending)
+        self._exhausted = len(page) < self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_key = SORT_COLUMNS.get(column, "timestamp")
+        self.descending = order == Qt.DescendingOrder
+        self.refresh()
+
+    # --- Helpers ---
+
+    def set_filters(self, filters: AttendanceFilter):
+        self.filters = filters
+        self.refresh()
+
+    def refresh(self):
+        """Drop the loaded pages and reload the first one, e.g. after a filter change or delete."""
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self._total = self.db.count_attendance(self.filters, cap=COUNT_CAP)
+        self.endResetModel()
+        self.fetchMore()
+
+    def total(self):
+        """Rows matching the filters, loaded or not, e.g. '1234' or '10000+'."""
+        return f"{self._total}+" if self._total >= COUNT_CAP else str(self._total)
+
+    def record_id(self, row):
+        return self._rows[row][0] if 0 <= row < len(self._rows) else None
@@ -1,20 +1,34 @@
 import cv2
-from facenet_pytorch import MTCNN
 import numpy as np
 import threading
 import time
 from PyQt5.QtCore import pyqtSignal, QObject
+from frame_scheduler import DetectionScheduler, PREVIEW_FPS
+from face_models import detection_settings, detect_faces_scaled, get_mtcnn
 
 class Camera(QObject):
     frame_signal = pyqtSignal(np.ndarray)  # Signal emitted to update UI with frame
 
-    def __init__(self, device=0):
+    def __init__(self, device=0, scheduler=None):
         super().__init__()
         self.device = device
         self.capture = cv2.VideoCapture(self.device)
-        self.mtcnn = MTCNN()
+        self.mtcnn = None  # Shared detector, fetched on the capture thread so opening a camera is instant
+        self.scheduler = scheduler or DetectionScheduler()
         self.running = False
         self.thread = None
+        self.frame_listeners = []  # Called from the capture thread with each raw frame
+
+    def add_frame_listener(self, callback):
+        """
+        Receive every raw (unannotated) BGR frame directly on the capture thread,
+        e.g. to feed a RecognitionPipeline without going through the GUI thread.
+
+        The callback is called as callback(frame, (boxes, landmarks)) with the
+        detections this camera already computed, so consumers need not run MTCNN again.
+        It only fires for frames the scheduler picked for detection.
+        """
+        self.frame_listeners.append(callback)
 
     def start(self):
         if not self.capture.isOpened():
@@ -26,15 +40,34 @@ class Camera(QObject):
         self.thread.start()
 
     def capture_frames(self):
+        faces = None
+        detection_scale = None
         while self.running:
+            loop_start = time.perf_counter()
             ret, frame = self.capture.read()
             if not ret:
                 print("Failed to grab frame.")
                 break
+            self.scheduler.record("capture", time.perf_counter() - loop_start)
+
+            # Detection only runs on the frames the scheduler picks; the preview
+            # reuses the latest boxes in between
+            if self.scheduler.should_detect(frame):
+                if detection_scale is None:
+                    # Size detection for this camera's resolution once
+                    detection_scale, min_face_size = detection_settings(frame.shape[1])
+                    self.mtcnn = get_mtcnn(min_face_size)
+                    print(f"[DEBUG] Detection scale {detection_scale:.2f}, min_face_size {min_face_size}")
+
+                detect_start = time.perf_counter()
+                # Detect on a small RGB view; boxes come back in full-frame coordinates
+                faces, _, landmarks = detect_faces_scaled(frame[..., ::-1], detection_scale, self.mtcnn)
+                self.scheduler.detection_done(time.perf_counter() - detect_start,
+                                              0 if faces is None else len(faces))
 
-            # Prepare RGB image for face detection
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            faces = self.mtcnn.detect(rgb_frame)[0]  # Only take the boxes
+                # Publish the clean frame with its detections before boxes are drawn on it
+                for callback in self.frame_listeners:
+                    callback(frame.copy(), (faces, landmarks))
 
             # Draw bounding boxes on the BGR frame
             if faces is not None:
@@ -51,8 +84,12 @@ class Camera(QObject):
             # Emit the processed frame
             self.frame_signal.emit(frame)
 
-            # Optional: limit FPS to ~30
-            time.sleep(1 / 30)
+            # Only pace sources that deliver faster than the preview rate (e.g. video files);
+            # a webcam's read() already blocks until the next frame
+            elapsed = time.perf_counter() - loop_start
+            self.scheduler.record("loop", elapsed)
+            if elapsed < 1 / PREVIEW_FPS:
+                time.sleep(1 / PREVIEW_FPS - elapsed)
 
     def stop(self):
         self.running = False
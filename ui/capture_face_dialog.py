@@ -2,12 +2,16 @@ import cv2
 import numpy as np
 from PyQt5.QtWidgets import QDialog, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QMessageBox
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from ui.camera import Camera
 from face_models import extract_embedding
 
+BURST_SIZE = 5  # Frames captured per click, each one an enrolment sample
+BURST_INTERVAL_MS = 300  # Spacing between burst frames, so pose and expression vary a little
+
+
 class CaptureFaceDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, burst_size=BURST_SIZE):
         super().__init__(parent)
         self.setWindowTitle("Capture Face from Camera")
         self.setMinimumSize(480, 400)
@@ -15,7 +19,14 @@ class CaptureFaceDialog(QDialog):
         self.camera = Camera()
         self.camera.frame_signal.connect(self.update_frame)
 
+        self.burst_size = burst_size
+        self.burst_timer = QTimer(self)
+        self.burst_timer.timeout.connect(self.capture_burst_frame)
+        self.burst_remaining = 0
+
         self.captured_image = None
+        self.captured_images = []
+        self.embeddings = []
 
         self.init_ui()
         self.camera.start()
@@ -47,23 +58,51 @@ class CaptureFaceDialog(QDialog):
                 self.image_label.width(), self.image_label.height(), Qt.KeepAspectRatio))
 
     def capture_image(self):
-        if hasattr(self, "current_frame"):
-            rgb_image = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2RGB)
-            embedding = extract_embedding(rgb_image)
-            if embedding is not None:
-                self.captured_image = rgb_image
-                self.embedding = embedding
-                self.accept()
-            else:
-                QMessageBox.warning(self, "Error", "No face detected in the captured image.")
+        """Start a burst: burst_size frames, BURST_INTERVAL_MS apart."""
+        if not hasattr(self, "current_frame"):
+            return
+        self.captured_images, self.embeddings = [], []
+        self.burst_remaining = self.burst_size
+        self.capture_btn.setEnabled(False)
+        self.capture_btn.setText("Capturing...")
+        self.capture_burst_frame()
+        self.burst_timer.start(BURST_INTERVAL_MS)
+
+    def capture_burst_frame(self):
+        rgb_image = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2RGB)
+        embedding = extract_embedding(rgb_image)
+        if embedding is not None:
+            self.captured_images.append(rgb_image)
+            self.embeddings.append(embedding)
+
+        self.burst_remaining -= 1
+        if self.burst_remaining > 0:
+            return
+        self.burst_timer.stop()
+        self.capture_btn.setEnabled(True)
+        self.capture_btn.setText("Capture")
+        if self.embeddings:
+            print(f"[DEBUG] Captured {len(self.embeddings)}/{self.burst_size} samples.")
+            self.captured_image = self.captured_images[0]
+            self.accept()
+        else:
+            QMessageBox.warning(self, "Error", "No face detected in the captured images.")
 
     def get_embedding(self):
-        return self.captured_image
+        return self.embeddings[0] if self.embeddings else None
+
+    def get_embeddings(self):
+        """Every sample of the burst in which a face was found."""
+        return list(self.embeddings)
 
     def get_captured_image(self):
-        return self.captured_image if hasattr(self, "captured_image") else None
+        return self.captured_image
+
+    def get_captured_images(self):
+        return list(self.captured_images)
 
     def closeEvent(self, event):
+        self.burst_timer.stop()
         if hasattr(self, 'camera'):
             self.camera.stop()
         super().closeEvent(event)
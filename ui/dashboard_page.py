@@ -4,22 +4,29 @@ from PyQt5.QtWidgets import (
     QFileDialog, QPushButton, QSizePolicy
 )
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
 from ui.camera import Camera
 from match_faces import match_face
+from recognition_pipeline import RecognitionPipeline
 from ui.utils import show_warning_message
-import time
 
 
 class DashboardPage(QWidget):
-    def __init__(self, db):
+    result_signal = pyqtSignal(object)  # RecognitionResult from the pipeline's record thread
+
+    def __init__(self, db, engine=None, writer=None):
         super().__init__()
         self.db = db
 
-        self.last_signed_time = {}
+        # Recognition runs in background workers; only results come back to the GUI
+        self.pipeline = RecognitionPipeline(self.db.db_path, on_result=self.result_signal.emit,
+                                            engine=engine, writer=writer)
+        self.result_signal.connect(self.show_recognition_result)
+        self.pipeline.start()
 
         self.camera = Camera()
         self.camera.frame_signal.connect(self.update_camera_frame)
+        self.camera.add_frame_listener(self.pipeline.submit)
         self.camera.start()
 
         self.init_ui()
@@ -53,21 +60,17 @@ class DashboardPage(QWidget):
             self.image_label.setPixmap(pixmap.scaled(
                 self.image_label.width(), self.image_label.height(), Qt.KeepAspectRatio))
 
-            cv2.imwrite("temp.jpg", frame)
-            matched_id, distance = match_face("temp.jpg")
-
-            if matched_id:
-                now = time.time()
-                last_time = self.last_signed_time.get(matched_id, 0)
+    def show_recognition_result(self, result):
+        for name in result.signed:
+            print(f"[DEBUG] Signed: {name}")
 
-                if now - last_time >= 30:
-                    self.db.add_attendance_record(matched_id)
-                    self.last_signed_time[matched_id] = now
-                    print(f"[DEBUG] Signed: {matched_id}")
-                    self.result_label.setText(f"Recognition Result: {matched_id} (Signed)")
-                else:
-                    #print(f"[DEBUG] Skipped duplicate sign-in for {matched_id}")
-                    self.result_label.setText(f"Already Signed Recently: {matched_id}")
+        if result.signed:
+            self.result_label.setText(f"Recognition Result: {', '.join(result.signed)} (Signed)")
+        else:
+            recognized = [name for name in result.names if name]
+            if recognized:
+                #print(f"[DEBUG] Skipped duplicate sign-in for {recognized}")
+                self.result_label.setText(f"Already Signed Recently: {', '.join(recognized)}")
 
     def load_and_recognize(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Images (*.png *.jpg *.jpeg)")
@@ -77,7 +80,7 @@ class DashboardPage(QWidget):
                 matched_id, distance = match_face(file_name)
                 if matched_id:
                     self.result_label.setText(f"Recognized: {matched_id} (Distance: {distance:.3f})")
-                    self.db.add_attendance_record(matched_id)
+                    self.pipeline.writer.add(matched_id)
                 else:
                     self.result_label.setText("No match found.")
             except Exception as e:
@@ -97,3 +100,4 @@ class DashboardPage(QWidget):
 
     def cleanup(self):
         self.camera.stop()
+        self.pipeline.stop()
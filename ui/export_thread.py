@@ -0,0 +1,32 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from attendance_export import ExportCancelled, export_attendance
+
+
+class AttendanceExportThread(QThread):
+    """Runs export_attendance off the GUI thread; cancel() stops it at the next chunk."""
+    progress_signal = pyqtSignal(int, int)  # rows written, total
+    done_signal = pyqtSignal(int, str)  # rows written, error message ('' on success, 'cancelled')
+
+    def __init__(self, db, path, filters, sort="timestamp", descending=True, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.path = path
+        self.filters = filters
+        self.sort = sort
+        self.descending = descending
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            count = export_attendance(self.db, self.path, self.filters, sort=self.sort, descending=self.descending,
+                                      progress=self.progress_signal.emit, is_cancelled=lambda: self._cancelled)
+        except ExportCancelled:
+            self.done_signal.emit(0, "cancelled")
+        except Exception as e:
+            self.done_signal.emit(0, str(e))
+        else:
+            self.done_signal.emit(count, "")
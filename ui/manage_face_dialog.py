@@ -49,24 +49,17 @@ class ManageFaceDialog(QDialog):
             return
 
         if method == "From Image File":
-            file_name, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Images (*.png *.jpg *.jpeg)")
-            if not file_name:
+            self.embedding = self.embeddings_from_files("Select Images")
+            if not self.embedding:
                 return
 
-            img_rgb = load_rgb_image(file_name)
-            if img_rgb is None:
-                show_warning_message(self, "Error", "Failed to load image.")
-                return
-
-            self.embedding = extract_embedding(img_rgb)
-
         else:  # From Camera
             capture_dialog = CaptureFaceDialog(self)
             if capture_dialog.exec_() != QDialog.Accepted:
                 return
 
-            self.embedding = capture_dialog.get_embedding()
-            if self.embedding is None:
+            self.embedding = capture_dialog.get_embeddings()
+            if not self.embedding:
                 show_warning_message(self, "Error", "No face detected.")
                 return
 
@@ -74,13 +67,37 @@ class ManageFaceDialog(QDialog):
         if not ok or not name.strip():
             return
 
-        if self.embedding is not None:
-            success = self.db.add_new_face(name.strip(), self.embedding.cpu().numpy().tobytes())
+        if self.embedding:
+            success = self.db.add_new_face(name.strip(), self.embedding)
             if success:
-                show_info_message(self, "Success", f"{name} added to database.")
+                show_info_message(self, "Success", f"{name} added to database with {len(self.embedding)} sample(s).")
             else:
                 show_warning_message(self, "Duplicate", f"{name} already exists.")
 
+    def embeddings_from_files(self, title):
+        """
+        Let the user pick one or more images and embed the largest face of each.
+
+        Returns:
+            list: Embeddings of the images in which a face was found (may be empty).
+        """
+        file_names, _ = QFileDialog.getOpenFileNames(self, title, "", "Images (*.png *.jpg *.jpeg)")
+        if not file_names:
+            return []
+
+        embeddings = []
+        for file_name in file_names:
+            img_rgb = load_rgb_image(file_name)
+            embedding = extract_embedding(img_rgb) if img_rgb is not None else None
+            if embedding is None:
+                print(f"[DEBUG] No usable face in {file_name}; skipped.")
+                continue
+            embeddings.append(embedding)
+
+        if not embeddings:
+            show_warning_message(self, "Error", "No face detected in the selected images.")
+        return embeddings
+
     def delete_face_ui(self):
         names = self.db.view_faces()
         if not names:
@@ -104,18 +121,17 @@ class ManageFaceDialog(QDialog):
         if not ok:
             return
 
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select New Image", "", "Images (*.png *.jpg *.jpeg)")
-        if not file_name:
+        mode, ok = get_selection_input(self, "Update Face", "What should happen to the existing samples?",
+                                       ["Replace Samples", "Add Samples"])
+        if not ok:
             return
 
-        img_rgb = load_rgb_image(file_name)
-        if img_rgb is None:
-            show_warning_message(self, "Error", "Failed to load image.")
+        new_embeddings = self.embeddings_from_files("Select New Images")
+        if not new_embeddings:
             return
 
-        new_embedding = extract_embedding(img_rgb)
-        if new_embedding is not None:
-            self.db.update_face(name, new_embedding.tobytes())
-            show_info_message(self, "Success", f"{name} updated.")
+        if mode == "Add Samples":
+            self.db.add_face_samples(name, new_embeddings)
         else:
-            show_warning_message(self, "Error", "No face detected.")
+            self.db.update_face(name, new_embeddings)
+        show_info_message(self, "Success", f"{name} updated with {len(new_embeddings)} sample(s).")